@@ -1,9 +1,14 @@
 from fastapi import APIRouter, FastAPI
 
+from api.routers.metrics import router as metrics_router
+from api.routers.readiness import router as readiness_router
+
 app = FastAPI()
 
 
 def init_routers():
     base_router = APIRouter()
+    base_router.include_router(metrics_router)
+    base_router.include_router(readiness_router)
 
     app.include_router(base_router)
@@ -1,27 +1,33 @@
 """
 In the future, I made into classes, but for now, just funcs
 """
-import json
-from json import JSONDecodeError
-
 from aio_pika import IncomingMessage
+from sqlalchemy import and_, inspect, or_, select
+from sqlalchemy.exc import IntegrityError
 
 from api import UserModel, CityModel
 from api.models import PermissionTypeModel, PermissionUserModel
+from api.models.permission_user_model import (
+    load_permission_type, load_user_permissions
+)
 from api.schemas.user import UserCreate, AuthorizedUser, UserAuthorization
-from common.base_manager import BaseManager
+from common.base_manager import AsyncBaseManager
 from common.constants.permissions import Permissions
-from common.exceptions import UserManagementException, CoreException
+from common.exceptions import (
+    CodecException, CoreException, UserManagementException
+)
+from common.tracing import tracer
 from services import sql
+from services.codec import codecs
 from services.jwt_manager import jwt_manager
 
 
-class UserManager(BaseManager):
+class UserManager(AsyncBaseManager):
     @staticmethod
-    def __create_user(user: UserCreate, password: str) -> UserModel:
-        city = CityModel.get_or_create(city=user.city)
+    async def __create_user(user: UserCreate, password: str) -> UserModel:
+        city = await CityModel.get_or_create_async(city=user.city)
 
-        user_model = UserModel.get_or_create(
+        user_model = await UserModel.create_async(
             name=user.name,
             surname=user.surname,
             phone=user.phone,
@@ -29,32 +35,62 @@ class UserManager(BaseManager):
             password=password
         )
 
-        permission_type = PermissionTypeModel.get_or_create(
+        permission_type = await PermissionTypeModel.get_or_create_async(
             permission_type=user.permission
         )
-        PermissionUserModel.get_or_create(
+        await PermissionUserModel.get_or_create_async(
             user_id=user_model.id,
             permission_type_id=permission_type.id
         )
+        # The link's trigger has bumped the revision the token is issued
+        # with.
+        await sql.async_session.refresh(
+            user_model, attribute_names=('permission_revision',)
+        )
 
         return user_model
 
-    def user_registration_handler(self, user: UserCreate) -> UserModel:
-        user_model = UserModel.get(name=user.name, surname=user.surname)
-        if user_model is not None:
+    async def check_user_not_registered(self, user: UserCreate) -> None:
+        result = await self.session.execute(
+            select(UserModel.name, UserModel.surname).where(
+                or_(
+                    and_(
+                        UserModel.name == user.name,
+                        UserModel.surname == user.surname
+                    ),
+                    UserModel.phone == user.phone
+                )
+            ).limit(1)
+        )
+        registered_user = result.first()
+        if registered_user is None:
+            return
+
+        if (
+            registered_user.name == user.name
+            and registered_user.surname == user.surname
+        ):
             raise UserManagementException('This user already registered"')
 
-        all_phones = sql.session.query(UserModel.phone).all()
-        if user.phone in all_phones:
-            raise UserManagementException('Phone is already in use')
+        raise UserManagementException('Phone is already in use')
 
-        password = jwt_manager.get_password_hash(user.password)
-        user_model = self.__create_user(user, password)
+    async def user_registration_handler(
+        self, user: UserCreate, password: str
+    ) -> UserModel:
+        try:
+            with tracer.span('create_user'):
+                user_model = await self.__create_user(user, password)
+        except IntegrityError:
+            raise UserManagementException(
+                'This user or phone is already registered'
+            )
 
         return user_model
 
     @staticmethod
-    def user_authorization_handler(user: UserAuthorization) -> UserModel:
+    async def user_authorization_handler(
+        user: UserAuthorization
+    ) -> UserModel:
         if user.password is None:
             raise UserManagementException(
                 'Authorization is not possible without a password'
@@ -74,56 +110,99 @@ class UserManager(BaseManager):
                 f'| Phone: {user.phone}'
             )
 
-        if user.phone is not None:
-            user_model = UserModel.get(phone=user.phone)
-        else:
-            user_model = UserModel.get(name=user.name, surname=user.surname)
+        with tracer.span('find_user'):
+            if user.phone is not None:
+                user_model = await UserModel.get_async(
+                    options=(load_user_permissions(),), phone=user.phone
+                )
+            else:
+                user_model = await UserModel.get_async(
+                    options=(load_user_permissions(),),
+                    name=user.name,
+                    surname=user.surname
+                )
 
         if user_model is None:
             raise UserManagementException('The user was not found!')
 
-        if not jwt_manager.verify_password(user.password, user_model.password):
-            raise UserManagementException('Incorrect login or password!')
-
         return user_model
 
     @staticmethod
-    def __get_current_user(authorized_user: AuthorizedUser) -> UserModel:
-        user_model = UserModel.get(
+    async def verify_user_password(
+        user: UserAuthorization, user_model: UserModel
+    ) -> None:
+        is_password_valid = await jwt_manager.verify_password_async(
+            user.password, user_model.password
+        )
+        if not is_password_valid:
+            raise UserManagementException('Incorrect login or password!')
+
+    @staticmethod
+    async def __get_current_user(
+        authorized_user: AuthorizedUser
+    ) -> UserModel:
+        user_model = await UserModel.get_by_id_async(
+            authorized_user.id,
+            options=(load_user_permissions(),),
             name=authorized_user.name,
             surname=authorized_user.surname,
             phone=authorized_user.phone,
             city_id=authorized_user.city_id,
             password=authorized_user.password
         )
+        if user_model is None:
+            raise UserManagementException('The user was not found!')
+
         return user_model
 
     @staticmethod
-    def __get_user_permission(user_model: UserModel) -> PermissionUserModel:
-        user_permissions: list[PermissionUserModel] = [
-            permission for permission in user_model.permissions
-            if permission.available
-        ]
-        return user_permissions[0]
-
-    def is_action_valid(
-        self,
-        authorized_user: AuthorizedUser,
-        message: IncomingMessage
-    ) -> bool:
-        user_model = self.__get_current_user(authorized_user)
-        message_payload = message.body.decode('utf8')
+    async def get_user_permission_type(user_model: UserModel) -> str:
+        if 'permissions' in inspect(user_model).dict:
+            user_permission = next(
+                (
+                    user_permission
+                    for user_permission in user_model.permissions
+                    if user_permission.available
+                ),
+                None
+            )
+        else:
+            user_permission = await PermissionUserModel.get_async(
+                options=(load_permission_type(),),
+                user_id=user_model.id,
+                available=True
+            )
+
+        if user_permission is None:
+            raise UserManagementException('The user has no permissions!')
+
+        return user_permission.permission_type.permission_type
+
+    @staticmethod
+    def get_message_action(message: IncomingMessage) -> str:
         try:
-            action = json.loads(message_payload)['action']
-        except (JSONDecodeError, KeyError):
+            action = codecs.loads(message)['action']
+        except (CodecException, KeyError, TypeError):
             raise CoreException('Incorrect action credentials!')
 
-        user_permission = self.__get_user_permission(user_model)
-        permission = Permissions.get_permission(
-            user_permission.permission_type.permission_type
-        )
+        return action
 
-        if action in permission.permission_actions:
-            return True
+    async def is_action_valid(
+        self,
+        authorized_user: AuthorizedUser,
+        action: str,
+        payload: dict
+    ) -> bool:
+        with tracer.span('find_user_permission'):
+            user_model = await self.__get_current_user(authorized_user)
+            is_action_valid = jwt_manager.is_action_valid(
+                payload, action, user_model.permission_revision
+            )
+            if is_action_valid is not None:
+                return is_action_valid
+
+            permission_type = await self.get_user_permission_type(
+                user_model
+            )
 
-        return False
+        return Permissions.can(permission_type, action)
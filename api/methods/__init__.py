@@ -0,0 +1,23 @@
+from api.methods.users import user_registration, user_handler_action, \
+    user_authorization, refresh_access_token
+from services.rabbitmq_manager import RabbitMQMethod
+from settings import settings
+
+
+def get_rpc_methods() -> list[RabbitMQMethod]:
+    return [
+        RabbitMQMethod(
+            'user_registration',
+            user_registration,
+            max_concurrency=settings.password_hash_workers * 2,
+            own_transaction=True
+        ),
+        RabbitMQMethod(
+            'user_authorization',
+            user_authorization,
+            max_concurrency=settings.password_hash_workers * 2,
+            own_transaction=True
+        ),
+        RabbitMQMethod('user_handler_action', user_handler_action),
+        RabbitMQMethod('refresh_access_token', refresh_access_token),
+    ]
@@ -4,45 +4,73 @@ from api.behavior.user_manager import UserManager
 from api.schemas.token import Token
 from api.schemas.user import UserCreate, AuthorizedUser, UserAuthorization
 from common.depends import Depends
+from common.tracing import tracer
 from services import sql
+from services.codec import codecs
 from services.jwt_manager import jwt_manager
 
 
-def user_registration(message: IncomingMessage) -> Token:
-    payload = message.body.decode('utf8')
-    user = UserCreate.parse_raw(payload)
+async def user_registration(message: IncomingMessage) -> Token:
+    with tracer.span('parse_payload'):
+        user = codecs.decode(message, UserCreate)
 
-    with UserManager(sql) as transaction:
-        user_model = transaction.user_registration_handler(user)
+    # Duplicates are rejected before paying for the hash; a registration
+    # racing past the check still fails on the unique constraints.
+    async with UserManager(sql) as transaction:
+        with tracer.span('check_user_not_registered'):
+            await transaction.check_user_not_registered(user)
 
-    token = jwt_manager.create_token(user_model)
+    password = await jwt_manager.get_password_hash_async(user.password)
+
+    async with UserManager(sql) as transaction:
+        user_model = await transaction.user_registration_handler(
+            user, password
+        )
+
+    token = jwt_manager.create_token(user_model, user.permission)
 
     return token
 
 
-def user_authorization(message: IncomingMessage) -> Token:
-    payload = message.body.decode('utf8')
-    user = UserAuthorization.parse_raw(payload)
+async def user_authorization(message: IncomingMessage) -> Token:
+    with tracer.span('parse_payload'):
+        user = codecs.decode(message, UserAuthorization)
 
-    with UserManager(sql) as transaction:
-        user_model = transaction.user_authorization_handler(user)
+    async with UserManager(sql) as transaction:
+        user_model = await transaction.user_authorization_handler(user)
+        permission_type = await transaction.get_user_permission_type(
+            user_model
+        )
 
-    token = jwt_manager.create_token(user_model)
+    await UserManager.verify_user_password(user, user_model)
+
+    token = jwt_manager.create_token(user_model, permission_type)
 
     return token
 
 
 @Depends(jwt_manager.jwt_required)
-def user_handler_action(message: IncomingMessage) -> bool:
+async def user_handler_action(message: IncomingMessage) -> bool:
     payload = jwt_manager.encode_token(message)
-    authorized_user = AuthorizedUser.parse_obj(payload)
+    action = UserManager.get_message_action(message)
 
-    with UserManager(sql) as transaction:
-        is_action_valid = transaction.is_action_valid(authorized_user, message)
+    authorized_user = AuthorizedUser.parse_obj(payload)
+    async with UserManager(sql) as transaction:
+        is_action_valid = await transaction.is_action_valid(
+            authorized_user, action, payload
+        )
 
     return is_action_valid
 
 
 @Depends(jwt_manager.jwt_required)
-def refresh_access_token(message: IncomingMessage) -> Token:
-    return jwt_manager.refresh_token(message)
+async def refresh_access_token(message: IncomingMessage) -> Token:
+    async with UserManager(sql) as transaction:
+        user_model = await jwt_manager.get_token_user(message)
+        permission_type = await transaction.get_user_permission_type(
+            user_model
+        )
+
+    token = jwt_manager.create_token(user_model, permission_type)
+
+    return token
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from sqlalchemy import BigInteger, Column, String
+from sqlalchemy import BigInteger, Column, String, UniqueConstraint
 
 from common.base_model import BaseModelInterface
 
 
 class CityModel(BaseModelInterface):
     __tablename__ = 'city_model'
+    __table_args__ = (
+        UniqueConstraint('city', name='unique_city'),
+    )
+    upsert_keys = ('city',)
+    reference_key = 'city'
 
     id = Column(BigInteger, primary_key=True)
     city = Column(String(256))
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from sqlalchemy import BigInteger, Column, String
+from sqlalchemy import BigInteger, Column, String, UniqueConstraint
 
 from common.base_model import BaseModelInterface
 
 
 class PermissionTypeModel(BaseModelInterface):
     __tablename__ = 'permission_type_model'
+    __table_args__ = (
+        UniqueConstraint('permission_type', name='unique_permission_type'),
+    )
+    upsert_keys = ('permission_type',)
+    reference_key = 'permission_type'
 
     id = Column(BigInteger, primary_key=True)
 
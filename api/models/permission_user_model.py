@@ -1,14 +1,26 @@
 from __future__ import annotations
 
-from sqlalchemy import BigInteger, Column, ForeignKey
-from sqlalchemy.orm import relationship
+from functools import lru_cache
+
+from sqlalchemy import (
+    DDL, BigInteger, Column, ForeignKey, UniqueConstraint, event
+)
+from sqlalchemy.orm import configure_mappers, joinedload, relationship
+from sqlalchemy.orm.interfaces import LoaderOption
 from sqlalchemy.sql.sqltypes import Boolean
 
+from api.models.user_model import UserModel
 from common.base_model import BaseModelInterface
 
 
 class PermissionUserModel(BaseModelInterface):
     __tablename__ = 'permission_user_model'
+    __table_args__ = (
+        UniqueConstraint(
+            'user_id', 'permission_type_id', name='unique_permission_user'
+        ),
+    )
+    upsert_keys = ('user_id', 'permission_type_id')
 
     id = Column(BigInteger, primary_key=True)
 
@@ -25,3 +37,48 @@ class PermissionUserModel(BaseModelInterface):
     )
 
     available = Column(Boolean, default=True)
+
+
+# Permission claims in tokens are trusted while they carry the user's
+# current revision. Links are also written by upserts and by hand, hence
+# a trigger instead of ORM events. Mirrors revision 9a3d6f2b8c41.
+for _statement in (
+    'CREATE OR REPLACE FUNCTION bump_permission_revision() '
+    'RETURNS trigger AS $$ BEGIN '
+    'UPDATE user_model SET permission_revision = permission_revision + 1 '
+    'WHERE id IN (OLD.user_id, NEW.user_id); '
+    'RETURN NULL; '
+    'END $$ LANGUAGE plpgsql',
+    'CREATE TRIGGER permission_user_revision '
+    'AFTER INSERT OR DELETE OR UPDATE OF user_id, permission_type_id, '
+    'available ON permission_user_model '
+    'FOR EACH ROW EXECUTE PROCEDURE bump_permission_revision()',
+):
+    event.listen(
+        PermissionUserModel.__table__,
+        'after_create',
+        DDL(_statement).execute_if(dialect='postgresql')
+    )
+
+
+@lru_cache
+def load_permission_type() -> LoaderOption:
+    """
+    Loader options are part of the cached lookup statement's key and
+    compare by identity, hence one shared instance.
+    """
+    return joinedload(PermissionUserModel.permission_type)
+
+
+@lru_cache
+def load_user_permissions() -> LoaderOption:
+    """
+    Joins a user's permission links and their types into the statement
+    that loads the user. The backref only exists once mappers are
+    configured.
+    """
+    configure_mappers()
+
+    return joinedload(UserModel.permissions).joinedload(
+        PermissionUserModel.permission_type
+    )
@@ -12,7 +12,9 @@ class UserModel(BaseModelInterface):
 
     __table_args__ = (
         UniqueConstraint('name', 'surname', name='unique_username'),
+        UniqueConstraint('phone', name='unique_phone'),
     )
+    cache_by_id = True
 
     id = Column(BigInteger, primary_key=True)
 
@@ -28,4 +30,7 @@ class UserModel(BaseModelInterface):
 
     password = Column(String())
 
+    # Bumped by a trigger whenever the user's permission links change.
+    permission_revision = Column(BigInteger, default=0, server_default='0')
+
     available = Column(Boolean, default=True)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+
+from services.metrics import rpc_metrics
+
+router = APIRouter()
+
+
+@router.get('/metrics')
+async def metrics() -> Response:
+    return Response(
+        rpc_metrics.render(),
+        media_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from common.readiness import readiness
+
+router = APIRouter()
+
+
+@router.get('/ready')
+async def ready() -> JSONResponse:
+    return JSONResponse(
+        {'ready': readiness.is_ready, 'phases': dict(readiness.phases)},
+        status_code=200 if readiness.is_ready else 503
+    )
@@ -1,37 +1,48 @@
 import asyncio
 
+import loguru
 from starlette.middleware.sessions import SessionMiddleware
 from uvicorn import Config, Server
 
 from api.app import app
 from api.base_settings import base_settings
-from api.methods.users import user_registration, user_handler_action, \
-    user_authorization, refresh_access_token
+from api.methods import get_rpc_methods
 from api.module_settings import event_loop
-from api.support_functions.initialize_permission_types import \
-    initialize_permission_types
-from services.rabbitmq_manager import rabbit_mq, RabbitMQMethod
+from api.startup import run_startup
+from common.tracing import tracer
+from services import sql
+from services.jwt_manager import jwt_manager
+from services.rabbitmq_manager import rabbit_mq
 
 app.add_middleware(SessionMiddleware, secret_key=base_settings.jwt_secret)
 app.middleware('http')(rabbit_mq.rpc_middleware)
+rabbit_mq.exempt_paths('/metrics', '/ready')
 
 
 @app.on_event('shutdown')
 async def shutdown_event():
-    pass
+    jwt_manager.shutdown()
+    tracer.shutdown()
+    await rabbit_mq.close()
+    await sql.close()
+
+
+def _on_startup_done(task: asyncio.Task) -> None:
+    if task.cancelled() or task.exception() is None:
+        return
+
+    loguru.logger.opt(exception=task.exception()).error(
+        'Startup failed, shutting down.'
+    )
+    server.should_exit = True
 
 
 @app.on_event('startup')
 async def startup_event():
-    methods = [
-        RabbitMQMethod('user_registration', user_registration),
-        RabbitMQMethod('user_authorization', user_authorization),
-        RabbitMQMethod('user_handler_action', user_handler_action),
-        RabbitMQMethod('refresh_access_token', refresh_access_token),
-    ]
-    asyncio.ensure_future(rabbit_mq.connect(event_loop, methods))
-
-    initialize_permission_types()
+    startup = asyncio.ensure_future(
+        run_startup(event_loop, get_rpc_methods())
+    )
+    startup.add_done_callback(_on_startup_done)
 
 
 config = Config(
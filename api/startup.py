@@ -0,0 +1,99 @@
+import asyncio
+import time
+from typing import Any, Awaitable
+
+import loguru
+from sqlalchemy import text
+
+from common.constants.startup import StartupPhases
+from common.readiness import readiness
+from services import sql
+from services.rabbitmq_manager import rabbit_mq, RabbitMQMethod
+from settings import settings
+
+
+async def _run_phase(phase: str, awaitable: Awaitable) -> Any:
+    started_at = time.perf_counter()
+    result = await awaitable
+    readiness.mark_ready(phase)
+    loguru.logger.info(
+        f'Startup phase "{phase}" finished in '
+        f'{time.perf_counter() - started_at:.3f}s'
+    )
+
+    return result
+
+
+def _prepare_schema() -> None:
+    from common.base_model import BaseModelInterface
+
+    if settings.run_alembic:
+        from services.alembic.alembic_handler import AlembicHandler
+
+        alembic_handler = AlembicHandler(
+            sql.session, sql.client, BaseModelInterface.metadata
+        )
+        sorted_metadata_tables = alembic_handler.execute()
+        BaseModelInterface.metadata.tables = sorted_metadata_tables
+        if alembic_handler.is_read_only:
+            sql.enable_read_only()
+
+    if not sql.is_read_only:
+        BaseModelInterface.metadata.create_all(sql.client)
+
+
+def _initialize_permission_types() -> None:
+    from api.support_functions.initialize_permission_types import \
+        initialize_permission_types
+
+    if not sql.is_read_only:
+        initialize_permission_types()
+
+
+async def _warm_up_database_pool() -> None:
+    async def connect() -> None:
+        async with sql.async_client.connect() as connection:
+            await connection.execute(text('SELECT 1'))
+
+    await asyncio.gather(*(
+        connect() for _ in range(settings.sql_warm_up_connections)
+    ))
+
+
+async def _prepare_database(loop: asyncio.AbstractEventLoop) -> None:
+    await settings.resolve_sql_host()
+
+    # The schema phase may switch to read-only, which only applies to
+    # connections opened afterwards, so the pool is warmed up after it.
+    await _run_phase(
+        StartupPhases.SCHEMA, loop.run_in_executor(None, _prepare_schema)
+    )
+    await asyncio.gather(
+        _run_phase(StartupPhases.DATABASE_POOL, _warm_up_database_pool()),
+        _run_phase(
+            StartupPhases.PERMISSION_TYPES,
+            loop.run_in_executor(None, _initialize_permission_types)
+        )
+    )
+
+
+async def run_startup(
+    loop: asyncio.AbstractEventLoop, methods: list[RabbitMQMethod]
+) -> None:
+    """
+    Independent phases run concurrently; RPC messages are consumed, and
+    the service reports ready, only once all of them are done.
+    """
+    readiness.register(*StartupPhases.values())
+
+    await asyncio.gather(
+        _run_phase(
+            StartupPhases.BROKER,
+            rabbit_mq.connect(loop, methods, consume=False)
+        ),
+        _prepare_database(loop)
+    )
+    await _run_phase(
+        StartupPhases.RPC_CONSUMERS, rabbit_mq.start_consuming()
+    )
+    loguru.logger.info('The service is ready to take traffic.')
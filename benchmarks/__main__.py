@@ -0,0 +1,61 @@
+"""
+Micro-benchmarks of the core hot paths.
+
+    python -m benchmarks                  # run and print
+    python -m benchmarks --save           # store results as baselines
+    python -m benchmarks --compare        # fail on regressions
+    python -m benchmarks -k jwt           # only names containing "jwt"
+"""
+import argparse
+import os
+import sys
+
+from benchmarks import codec, hot_paths  # noqa: F401  (registration)
+from benchmarks.suite import (
+    find_regressions, load_baselines, run_benchmarks, save_baselines
+)
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('-k', dest='name_filter', default=None)
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--save', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    arguments = parser.parse_args()
+
+    results, skipped = run_benchmarks(arguments.name_filter)
+    baselines = load_baselines(arguments.baselines)
+
+    for name, seconds in results.items():
+        line = f'{name:<40} {seconds * 1e6:12.2f} us'
+        if name in baselines:
+            line += f'   x{seconds / baselines[name]:.2f} of baseline'
+        print(line)
+    for name, reason in skipped.items():
+        print(f'{name:<40} skipped: {reason}')
+
+    if arguments.save:
+        save_baselines(arguments.baselines, results)
+        print(f'Baselines saved to {arguments.baselines}')
+
+    if arguments.compare:
+        regressions = find_regressions(
+            results, baselines, arguments.tolerance
+        )
+        for name, ratio in regressions.items():
+            print(
+                f'REGRESSION {name}: x{ratio:.2f} of baseline '
+                f'(tolerance {arguments.tolerance:.0%})'
+            )
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Compares the RPC codec layer against the previous decoding/encoding path:
+`python -m benchmarks -k codec`
+"""
+import json
+from types import SimpleNamespace
+
+from api.schemas.token import Token
+from api.schemas.user import UserCreate
+from benchmarks.suite import SkipBenchmark, benchmark
+from services.codec import codecs, msgpack_codec
+
+NUMBER = 20000
+
+user_payload = {
+    'name': 'Name',
+    'surname': 'Surname',
+    'phone': '+70000000000',
+    'city': 'Moscow',
+    'password': 'password',
+    'permission': 'client'
+}
+token = Token(access_token='a' * 300, refresh_token='r' * 300)
+json_message = SimpleNamespace(
+    body=json.dumps(user_payload).encode('utf-8'), content_type=None
+)
+
+
+def _require_msgpack() -> None:
+    if msgpack_codec is None:
+        raise SkipBenchmark('msgpack is not installed')
+
+
+@benchmark('codec.decode.current', number=NUMBER)
+def current_decode():
+    def decode() -> UserCreate:
+        payload = json_message.body.decode('utf8')
+        return UserCreate.parse_raw(payload)
+
+    return decode
+
+
+@benchmark('codec.decode.json', number=NUMBER)
+def codec_decode():
+    return lambda: codecs.decode(json_message, UserCreate)
+
+
+@benchmark('codec.decode.msgpack', number=NUMBER)
+def codec_decode_msgpack():
+    _require_msgpack()
+    msgpack_message = SimpleNamespace(
+        body=msgpack_codec.dumps(user_payload),
+        content_type=msgpack_codec.content_type
+    )
+    return lambda: codecs.decode(msgpack_message, UserCreate)
+
+
+@benchmark('codec.encode.current', number=NUMBER)
+def current_encode():
+    def encode() -> bytes:
+        result_message = {'status': True, 'answer': token.dict()}
+        return json.dumps(result_message).encode('utf-8')
+
+    return encode
+
+
+@benchmark('codec.encode.json', number=NUMBER)
+def codec_encode():
+    return lambda: codecs.dumps({'status': True, 'answer': token})
+
+
+@benchmark('codec.encode.msgpack', number=NUMBER)
+def codec_encode_msgpack():
+    _require_msgpack()
+    return lambda: codecs.dumps(
+        {'status': True, 'answer': token}, msgpack_codec.content_type
+    )
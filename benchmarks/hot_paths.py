@@ -0,0 +1,224 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Awaitable, Callable
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from api.models.city_model import CityModel
+from api.models.user_model import UserModel
+from api.schemas.user import UserAuthorization, UserCreate
+from benchmarks.suite import SkipBenchmark, benchmark
+from common.base_model import BaseModelInterface
+from common.constants.permissions import (
+    PermissionActions, Permissions, PermissionTypes
+)
+from services import sql
+from services.jwt_manager import jwt_manager
+
+user_payload = {
+    'name': 'Name',
+    'surname': 'Surname',
+    'phone': '+70000000000',
+    'city': 'Moscow',
+    'password': 'password',
+    'permission': PermissionTypes.CLIENT
+}
+authorization_payload = {
+    'password': 'password',
+    'phone': '+70000000000'
+}
+
+
+def _user_model() -> UserModel:
+    return UserModel(
+        id=1,
+        name='Name',
+        surname='Surname',
+        phone='+70000000000',
+        city_id=1,
+        password='hash',
+        available=True
+    )
+
+
+def _token_message() -> SimpleNamespace:
+    token = jwt_manager.create_token(_user_model(), PermissionTypes.CLIENT)
+    return SimpleNamespace(headers={
+        'Authorization': f'{token.token_type} {token.access_token}',
+        'refresh': token.refresh_token
+    })
+
+
+@benchmark('jwt.create_token', number=2000)
+def create_token():
+    user_model = _user_model()
+    return lambda: jwt_manager.create_token(
+        user_model, PermissionTypes.CLIENT
+    )
+
+
+@benchmark('jwt.encode_token.cold', number=2000)
+def encode_token_cold():
+    message = _token_message()
+
+    def encode_token() -> dict:
+        jwt_manager.token_cache.clear()
+        return jwt_manager.encode_token(message)
+
+    return encode_token
+
+
+@benchmark('jwt.encode_token.cached', number=20000)
+def encode_token_cached():
+    message = _token_message()
+    return lambda: jwt_manager.encode_token(message)
+
+
+@benchmark('jwt.verify_password', number=3, repeat=3)
+def verify_password():
+    try:
+        hashed_password = jwt_manager.get_password_hash('password')
+    except ValueError as exception:
+        raise SkipBenchmark(f'bcrypt backend unavailable: {exception}')
+
+    return lambda: jwt_manager.verify_password('password', hashed_password)
+
+
+@benchmark('permissions.get_permission', number=100000)
+def get_permission():
+    return lambda: Permissions.get_permission(PermissionTypes.MODERATOR)
+
+
+@benchmark('permissions.can', number=100000)
+def permissions_can():
+    return lambda: Permissions.can(
+        PermissionTypes.MODERATOR, PermissionActions.VIEW_ALL_PROFILES
+    )
+
+
+@benchmark('schemas.parse.user_create', number=20000)
+def parse_user_create():
+    body = json.dumps(user_payload)
+    return lambda: UserCreate.parse_raw(body)
+
+
+@benchmark('schemas.parse.user_authorization', number=20000)
+def parse_user_authorization():
+    body = json.dumps(authorization_payload)
+    return lambda: UserAuthorization.parse_raw(body)
+
+
+def _database_session():
+    try:
+        with sql.client.connect():
+            pass
+    except OperationalError as exception:
+        raise SkipBenchmark(f'database unavailable: {exception.orig}')
+
+    return sql.session
+
+
+def _sqlite_session() -> Session:
+    engine = create_engine('sqlite://')
+    CityModel.__table__.create(engine)
+    session = Session(engine)
+    session.add(CityModel(id=1, city='Benchmark'))
+    session.commit()
+
+    return session
+
+
+@benchmark('models.lookup.built_per_call', number=2000)
+def model_lookup_built_per_call():
+    session = _sqlite_session()
+
+    def lookup() -> CityModel:
+        filters = CityModel.generate_filters(CityModel, city='Benchmark')
+        result = session.execute(select(CityModel).filter(*filters).limit(1))
+        return result.scalars().first()
+
+    return lookup
+
+
+@benchmark('models.lookup.cached_statement', number=2000)
+def model_lookup_cached_statement():
+    session = _sqlite_session()
+
+    def lookup() -> CityModel:
+        result = session.execute(
+            CityModel.select_statement(city='Benchmark'), {'city': 'Benchmark'}
+        )
+        return result.scalars().first()
+
+    return lookup
+
+
+@benchmark('models.get', number=500)
+def model_get():
+    session = _database_session()
+
+    def get() -> CityModel:
+        instance = CityModel.get(city='Benchmark')
+        session.rollback()
+        return instance
+
+    return get
+
+
+@benchmark('models.get_or_create', number=500)
+def model_get_or_create():
+    session = _database_session()
+
+    def get_or_create() -> CityModel:
+        instance = CityModel.get_or_create(city='Benchmark')
+        session.flush()
+        session.rollback()
+        return instance
+
+    return get_or_create
+
+
+_async_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _run_in_async_session(
+    get_instance: Callable[[], Awaitable[BaseModelInterface]]
+) -> Callable[[], BaseModelInterface]:
+    """
+    Times the async lookups RPC handlers use, each call on a fresh
+    session that is rolled back like the sync cases. The async engine
+    pool belongs to one loop, which all cases share.
+    """
+    global _async_loop
+    _database_session()
+    if _async_loop is None:
+        _async_loop = asyncio.new_event_loop()
+
+    async def run() -> BaseModelInterface:
+        session = sql.create_async_session()
+        token = sql.bind_async_session(session)
+        try:
+            return await get_instance()
+        finally:
+            await session.rollback()
+            await session.close()
+            sql.unbind_async_session(token)
+
+    return lambda: _async_loop.run_until_complete(run())
+
+
+@benchmark('models.get_async', number=500)
+def model_get_async():
+    return _run_in_async_session(
+        lambda: CityModel.get_async(city='Benchmark')
+    )
+
+
+@benchmark('models.get_or_create_async', number=500)
+def model_get_or_create_async():
+    return _run_in_async_session(
+        lambda: CityModel.get_or_create_async(city='Benchmark')
+    )
@@ -0,0 +1,225 @@
+"""
+In-process stand-in for the part of RabbitMQ the RPC layer talks to:
+named queues, the default exchange, prefetch and reply queues. It can be
+passed to `RabbitMQ.connect` as the connection factory.
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+from aio_pika import Message
+
+
+class MemoryIncomingMessage:
+    __slots__ = (
+        'body',
+        'headers',
+        'content_type',
+        'correlation_id',
+        'reply_to',
+        'type',
+        'routing_key'
+    )
+
+    def __init__(self, message: Message, routing_key: str) -> None:
+        self.body: bytes = message.body
+        self.headers: dict = dict(message.headers or {})
+        self.content_type: str | None = message.content_type
+        self.correlation_id: str | None = message.correlation_id
+        self.reply_to: str | None = message.reply_to
+        self.type: str | None = message.type
+        self.routing_key = routing_key
+
+    @asynccontextmanager
+    async def process(self, **kwargs: Any) -> AsyncIterator[None]:
+        yield
+
+
+class MemoryQueue:
+    __slots__ = ('name', '__messages', '__consumers')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.__messages: asyncio.Queue[MemoryIncomingMessage] = (
+            asyncio.Queue()
+        )
+        self.__consumers: dict[str, asyncio.Task] = {}
+
+    def put(self, message: MemoryIncomingMessage) -> None:
+        self.__messages.put_nowait(message)
+
+    async def consume(
+        self,
+        callback: Callable,
+        prefetch: asyncio.Semaphore | None
+    ) -> str:
+        consumer_tag = f'ctag.{uuid.uuid4().hex}'
+        self.__consumers[consumer_tag] = asyncio.create_task(
+            self.__dispatch(callback, prefetch)
+        )
+
+        return consumer_tag
+
+    async def __dispatch(
+        self, callback: Callable, prefetch: asyncio.Semaphore | None
+    ) -> None:
+        while True:
+            message = await self.__messages.get()
+            if prefetch is None:
+                asyncio.create_task(callback(message))
+                continue
+
+            await prefetch.acquire()
+            task = asyncio.create_task(callback(message))
+            task.add_done_callback(lambda _: prefetch.release())
+
+    async def cancel(self, consumer_tag: str, **kwargs: Any) -> None:
+        task = self.__consumers.pop(consumer_tag, None)
+        if task is not None:
+            task.cancel()
+
+    async def close(self) -> None:
+        for consumer_tag in list(self.__consumers):
+            await self.cancel(consumer_tag)
+
+
+class MemoryExchange:
+    __slots__ = ('name', '__broker')
+
+    def __init__(self, broker: 'MemoryBroker', name: str = '') -> None:
+        self.name = name
+        self.__broker = broker
+
+    async def publish(
+        self, message: Message, routing_key: str, **kwargs: Any
+    ) -> None:
+        if self.name == '':
+            self.__broker.route(message, routing_key)
+
+
+class MemoryChannel:
+    __slots__ = (
+        '__broker',
+        '__prefetch',
+        '__queues',
+        'default_exchange',
+        'close_callbacks',
+        'return_callbacks',
+        'is_closed'
+    )
+
+    def __init__(self, broker: 'MemoryBroker') -> None:
+        self.__broker = broker
+        self.__prefetch: asyncio.Semaphore | None = None
+        self.__queues: list[MemoryQueue] = []
+        self.default_exchange = MemoryExchange(broker)
+        self.close_callbacks: set[Callable] = set()
+        self.return_callbacks: set[Callable] = set()
+        self.is_closed: bool = False
+
+    async def set_qos(self, prefetch_count: int = 0, **kwargs: Any) -> None:
+        self.__prefetch = (
+            asyncio.Semaphore(prefetch_count) if prefetch_count else None
+        )
+
+    async def declare_queue(
+        self, name: str | None = None, **kwargs: Any
+    ) -> 'ChannelQueue':
+        queue = self.__broker.declare_queue(name)
+        self.__queues.append(queue)
+
+        return ChannelQueue(queue, self)
+
+    async def declare_exchange(
+        self, name: str, *args: Any, **kwargs: Any
+    ) -> MemoryExchange:
+        return MemoryExchange(self.__broker, name)
+
+    def get_prefetch(self, no_ack: bool) -> asyncio.Semaphore | None:
+        return None if no_ack else self.__prefetch
+
+    async def close(self) -> None:
+        for queue in self.__queues:
+            await queue.close()
+        self.is_closed = True
+
+
+class ChannelQueue:
+    __slots__ = ('__queue', '__channel', 'name')
+
+    def __init__(self, queue: MemoryQueue, channel: MemoryChannel) -> None:
+        """
+        A queue as seen through one channel, so that consumers inherit the
+        channel prefetch like they do with a real broker.
+        """
+        self.__queue = queue
+        self.__channel = channel
+        self.name = queue.name
+
+    async def consume(
+        self, callback: Callable, no_ack: bool = False, **kwargs: Any
+    ) -> str:
+        return await self.__queue.consume(
+            callback, self.__channel.get_prefetch(no_ack)
+        )
+
+    async def bind(self, *args: Any, **kwargs: Any) -> None:
+        ...
+
+    async def unbind(self, *args: Any, **kwargs: Any) -> None:
+        ...
+
+    async def cancel(self, consumer_tag: str, **kwargs: Any) -> None:
+        await self.__queue.cancel(consumer_tag)
+
+
+class MemoryConnection:
+    __slots__ = ('__broker', '__channels', 'is_closed')
+
+    def __init__(self, broker: 'MemoryBroker') -> None:
+        self.__broker = broker
+        self.__channels: list[MemoryChannel] = []
+        self.is_closed: bool = False
+
+    async def channel(self, *args: Any, **kwargs: Any) -> MemoryChannel:
+        channel = MemoryChannel(self.__broker)
+        self.__channels.append(channel)
+
+        return channel
+
+    async def close(self) -> None:
+        for channel in self.__channels:
+            await channel.close()
+        self.is_closed = True
+
+
+class MemoryBroker:
+    __slots__ = ('__queues', 'published', 'unroutable')
+
+    def __init__(self) -> None:
+        self.__queues: dict[str, MemoryQueue] = {}
+        self.published: int = 0
+        self.unroutable: int = 0
+
+    async def connect(self, *args: Any, **kwargs: Any) -> MemoryConnection:
+        return MemoryConnection(self)
+
+    def declare_queue(self, name: str | None) -> MemoryQueue:
+        if not name:
+            name = f'amq.gen-{uuid.uuid4().hex}'
+
+        queue = self.__queues.get(name)
+        if queue is None:
+            queue = self.__queues[name] = MemoryQueue(name)
+
+        return queue
+
+    def route(self, message: Message, routing_key: str) -> None:
+        self.published += 1
+        queue = self.__queues.get(routing_key)
+        if queue is None:
+            self.unroutable += 1
+            return
+
+        queue.put(MemoryIncomingMessage(message, routing_key))
@@ -0,0 +1,428 @@
+"""
+Drives the registered RPC methods end to end and reports latency
+percentiles and throughput:
+`python -m benchmarks.rpc_load --concurrency 32 --rate 500 --duration 10`
+
+Uses a local RabbitMQ when one answers on `settings.ampq_connection_string`
+and the in-memory broker otherwise (see `--broker`).
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any
+
+import loguru
+from aio_pika import connect_robust, DeliveryMode, Message
+
+from api.behavior.user_manager import UserManager
+from api.methods import get_rpc_methods
+from api.models.user_model import UserModel
+from api.schemas.token import Token
+from api.schemas.user import UserCreate
+from benchmarks.memory_broker import MemoryBroker
+from common.constants.permissions import PermissionActions, PermissionTypes
+from services import sql
+from services.codec import codecs
+from services.jwt_manager import jwt_manager
+from services.rabbitmq_manager import RabbitMQ, RabbitMQMethod
+from settings import settings
+
+DEFAULT_MIX = {
+    'user_registration': 1,
+    'user_authorization': 2,
+    'user_handler_action': 10,
+    'refresh_access_token': 1,
+}
+
+
+@dataclass(slots=True)
+class MethodStatistics:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    timeouts: int = 0
+    last_error: str | None = None
+
+    def add(self, statistics: 'MethodStatistics') -> None:
+        self.latencies.extend(statistics.latencies)
+        self.errors += statistics.errors
+        self.timeouts += statistics.timeouts
+        self.last_error = statistics.last_error or self.last_error
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return math.nan
+
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class RPCClient:
+    __slots__ = ('__channel', '__reply_queue', '__futures')
+
+    def __init__(self, channel: Any) -> None:
+        self.__channel = channel
+        self.__reply_queue: Any = None
+        self.__futures: dict[str, asyncio.Future] = {}
+
+    async def start(self) -> None:
+        self.__reply_queue = await self.__channel.declare_queue(
+            None, exclusive=True, auto_delete=True
+        )
+        await self.__reply_queue.consume(self.__on_reply, no_ack=True)
+
+    async def __on_reply(self, message: Any) -> None:
+        future = self.__futures.pop(message.correlation_id, None)
+        if future is not None and not future.done():
+            future.set_result(codecs.loads(message))
+
+    async def call(
+        self, method_name: str, body: bytes, headers: dict, timeout: float
+    ) -> dict:
+        correlation_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self.__futures[correlation_id] = future
+
+        await self.__channel.default_exchange.publish(
+            Message(
+                body,
+                headers=headers,
+                content_type='application/json',
+                correlation_id=correlation_id,
+                reply_to=self.__reply_queue.name,
+                delivery_mode=DeliveryMode.NOT_PERSISTENT
+            ),
+            'core_' + method_name
+        )
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.__futures.pop(correlation_id, None)
+
+
+SEED_USER = UserCreate(
+    name='Load',
+    surname='Test',
+    phone='+70000000000',
+    city='Moscow',
+    password='password',
+    permission=PermissionTypes.CLIENT
+)
+
+
+async def _seed_token() -> Token:
+    """
+    Registers the seed user on the first run and issues its tokens the
+    way authorization does, so that the token methods take their success
+    path.
+    """
+    async with UserManager(sql):
+        user_model = await UserModel.get_async(phone=SEED_USER.phone)
+
+    if user_model is None:
+        password = await jwt_manager.get_password_hash_async(
+            SEED_USER.password
+        )
+        async with UserManager(sql) as transaction:
+            user_model = await transaction.user_registration_handler(
+                SEED_USER, password
+            )
+
+    async with UserManager(sql) as transaction:
+        permission_type = await transaction.get_user_permission_type(
+            user_model
+        )
+
+    return jwt_manager.create_token(user_model, permission_type)
+
+
+def _noop_token() -> Token:
+    user_model = UserModel(
+        id=1,
+        name=SEED_USER.name,
+        surname=SEED_USER.surname,
+        phone=SEED_USER.phone,
+        city_id=1,
+        password='',
+        available=True
+    )
+
+    return jwt_manager.create_token(user_model, SEED_USER.permission)
+
+
+class RequestFactory:
+    __slots__ = ('__headers',)
+
+    def __init__(self, token: Token) -> None:
+        self.__headers = {
+            'Authorization': f'{token.token_type} {token.access_token}',
+            'refresh': token.refresh_token
+        }
+
+    @classmethod
+    async def create(cls, seed_user: bool = True) -> 'RequestFactory':
+        return cls(await _seed_token() if seed_user else _noop_token())
+
+    def build(self, method_name: str) -> tuple[bytes, dict]:
+        if method_name == 'user_registration':
+            payload = {
+                'name': 'Load',
+                'surname': uuid.uuid4().hex,
+                'phone': uuid.uuid4().hex,
+                'city': 'Moscow',
+                'password': 'password',
+                'permission': PermissionTypes.CLIENT
+            }
+            return codecs.dumps(payload), {}
+        if method_name == 'user_authorization':
+            payload = {
+                'phone': SEED_USER.phone, 'password': SEED_USER.password
+            }
+            return codecs.dumps(payload), {}
+        if method_name == 'user_handler_action':
+            payload = {'action': PermissionActions.VIEW_PROFILE}
+            return codecs.dumps(payload), self.__headers
+
+        return codecs.dumps({}), self.__headers
+
+
+class Pacer:
+    __slots__ = ('__interval', '__next_at')
+
+    def __init__(self, rate: float) -> None:
+        """
+        Spreads requests of all workers evenly to reach the target rate;
+        a rate of zero sends as fast as the workers get replies.
+        """
+        self.__interval = 1 / rate if rate > 0 else 0.0
+        self.__next_at: float | None = None
+
+    async def wait(self) -> None:
+        if not self.__interval:
+            return
+
+        now = time.perf_counter()
+        if self.__next_at is None or self.__next_at < now - 1:
+            self.__next_at = now
+        scheduled_at = self.__next_at
+        self.__next_at += self.__interval
+
+        if scheduled_at > now:
+            await asyncio.sleep(scheduled_at - now)
+
+
+def _create_noop_handler() -> Any:
+    # Handlers are keyed by function in the RPC helper, so each method
+    # needs its own.
+    async def noop_handler(message: Any) -> bool:
+        return True
+
+    return noop_handler
+
+
+async def _open_broker(broker: str) -> tuple[Any, Any]:
+    """
+    Returns the client connection and the connection factory for the
+    server side.
+    """
+    if broker in ('amqp', 'auto'):
+        try:
+            connection = await asyncio.wait_for(
+                connect_robust(settings.ampq_connection_string), timeout=3
+            )
+            return connection, connect_robust
+        except Exception as exception:
+            if broker == 'amqp':
+                raise
+            loguru.logger.info(
+                f'RabbitMQ is not available ({exception}), '
+                f'using the in-memory broker'
+            )
+
+    memory_broker = MemoryBroker()
+    return await memory_broker.connect(), memory_broker.connect
+
+
+async def _worker(
+    client: RPCClient,
+    requests: RequestFactory,
+    pacer: Pacer,
+    mix: dict[str, float],
+    statistics: dict[str, MethodStatistics],
+    deadline: float,
+    timeout: float
+) -> None:
+    method_names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await pacer.wait()
+        method_name = random.choices(method_names, weights)[0]
+        body, headers = requests.build(method_name)
+        method_statistics = statistics[method_name]
+
+        started_at = time.perf_counter()
+        try:
+            reply = await client.call(method_name, body, headers, timeout)
+        except asyncio.TimeoutError:
+            method_statistics.timeouts += 1
+            continue
+
+        method_statistics.latencies.append(time.perf_counter() - started_at)
+        if not reply.get('status'):
+            method_statistics.errors += 1
+            method_statistics.last_error = reply.get('error')
+
+
+async def run_load(
+    mix: dict[str, float],
+    concurrency: int = 16,
+    rate: float = 0.0,
+    duration: float = 10.0,
+    timeout: float = 10.0,
+    broker: str = 'auto',
+    noop_handlers: bool = False
+) -> tuple[dict[str, MethodStatistics], float]:
+    methods = [
+        method for method in get_rpc_methods() if method.method_name in mix
+    ]
+    if noop_handlers:
+        methods = [
+            RabbitMQMethod(
+                method.method_name,
+                _create_noop_handler(),
+                method.prefetch_count,
+                method.max_concurrency,
+                method.own_transaction
+            )
+            for method in methods
+        ]
+
+    client_connection, connection_factory = await _open_broker(broker)
+    server = RabbitMQ(settings.ampq_connection_string, settings.service_name)
+    await server.connect(
+        asyncio.get_running_loop(),
+        methods,
+        connection_factory=connection_factory
+    )
+
+    client = RPCClient(await client_connection.channel())
+    await client.start()
+
+    statistics = {method_name: MethodStatistics() for method_name in mix}
+    pacer = Pacer(rate)
+    requests = await RequestFactory.create(seed_user=not noop_handlers)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(
+            client,
+            requests,
+            pacer,
+            mix,
+            statistics,
+            started_at + duration,
+            timeout
+        )
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started_at
+
+    await server.close()
+    await client_connection.close()
+
+    return statistics, elapsed
+
+
+def render_report(
+    statistics: dict[str, MethodStatistics], elapsed: float
+) -> str:
+    total = MethodStatistics()
+    lines = [
+        f'{"method":<24}{"count":>8}{"errors":>8}{"timeouts":>9}'
+        f'{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"msg/s":>10}'
+    ]
+    for method_name, method_statistics in [
+        *statistics.items(), ('total', total)
+    ]:
+        if method_name != 'total':
+            total.add(method_statistics)
+
+        latencies = sorted(method_statistics.latencies)
+        lines.append(
+            f'{method_name:<24}{len(latencies):>8}'
+            f'{method_statistics.errors:>8}{method_statistics.timeouts:>9}'
+            f'{percentile(latencies, 0.50) * 1000:>10.2f}'
+            f'{percentile(latencies, 0.95) * 1000:>10.2f}'
+            f'{percentile(latencies, 0.99) * 1000:>10.2f}'
+            f'{len(latencies) / elapsed:>10.1f}'
+        )
+
+    for method_name, method_statistics in statistics.items():
+        if method_statistics.last_error is not None:
+            lines.append(
+                f'last {method_name} error: {method_statistics.last_error}'
+            )
+
+    return '\n'.join(lines)
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(','):
+        method_name, _, weight = item.partition('=')
+        mix[method_name.strip()] = float(weight or 1)
+
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f'Unknown methods: {", ".join(sorted(unknown))}'
+        )
+
+    return {
+        method_name: weight
+        for method_name, weight in mix.items() if weight > 0
+    }
+
+
+async def main(arguments: argparse.Namespace) -> None:
+    try:
+        statistics, elapsed = await run_load(
+            arguments.mix,
+            concurrency=arguments.concurrency,
+            rate=arguments.rate,
+            duration=arguments.duration,
+            timeout=arguments.timeout,
+            broker=arguments.broker,
+            noop_handlers=arguments.noop_handlers
+        )
+    finally:
+        jwt_manager.shutdown()
+        await sql.close()
+
+    print(render_report(statistics, elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.rpc_load')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument(
+        '--rate', type=float, default=0.0,
+        help='target requests per second, 0 for unlimited'
+    )
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument(
+        '--mix', type=parse_mix, default=DEFAULT_MIX,
+        help='weights, e.g. user_handler_action=10,user_authorization=2'
+    )
+    parser.add_argument(
+        '--broker', choices=('auto', 'memory', 'amqp'), default='auto'
+    )
+    parser.add_argument(
+        '--noop-handlers', action='store_true',
+        help='replace handlers with no-ops to measure the RPC layer alone'
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+import json
+import timeit
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+class SkipBenchmark(Exception):
+    ...
+
+
+@dataclass(slots=True)
+class Benchmark:
+    name: str
+    prepare: Callable[[], Callable[[], Any]]
+    number: int = 1000
+    repeat: int = 5
+
+
+benchmarks: dict[str, Benchmark] = {}
+
+
+def benchmark(
+    name: str, number: int = 1000, repeat: int = 5
+) -> Callable[[Callable], Callable]:
+    """
+    Registers a factory that prepares its fixtures and returns the
+    callable to be timed. The factory raises SkipBenchmark when the
+    environment cannot run it (no database, no bcrypt backend...).
+    """
+    def register(prepare: Callable[[], Callable[[], Any]]) -> Callable:
+        if name in benchmarks:
+            raise RuntimeError(f'Benchmark {name} is already registered')
+
+        benchmarks[name] = Benchmark(name, prepare, number, repeat)
+        return prepare
+
+    return register
+
+
+def run_benchmark(bench: Benchmark) -> float:
+    function = bench.prepare()
+    timings = timeit.repeat(function, number=bench.number, repeat=bench.repeat)
+
+    return min(timings) / bench.number
+
+
+def run_benchmarks(
+    name_filter: str | None = None
+) -> tuple[dict[str, float], dict[str, str]]:
+    results, skipped = {}, {}
+    for name, bench in benchmarks.items():
+        if name_filter is not None and name_filter not in name:
+            continue
+
+        try:
+            results[name] = run_benchmark(bench)
+        except SkipBenchmark as exception:
+            skipped[name] = str(exception).strip().split('\n')[0]
+
+    return results, skipped
+
+
+def load_baselines(path: str) -> dict[str, float]:
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(path: str, results: dict[str, float]) -> None:
+    baselines = load_baselines(path)
+    baselines.update(results)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(dict(sorted(baselines.items())), file, indent=4)
+        file.write('\n')
+
+
+def find_regressions(
+    results: dict[str, float],
+    baselines: dict[str, float],
+    tolerance: float
+) -> dict[str, float]:
+    return {
+        name: seconds / baselines[name]
+        for name, seconds in results.items()
+        if name in baselines and seconds > baselines[name] * (1 + tolerance)
+    }
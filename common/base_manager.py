@@ -1,17 +1,23 @@
 import traceback
+from contextvars import Token
 
 import loguru
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncSessionTransaction
 
-from services.sql import SQL
+from services.sql import SQL, QueryCounter
 
 
 class BaseManager:
-    __slots__ = ('__sql',)
+    __slots__ = ('__sql', '__session_scope_token', '__query_counter_token')
 
     def __init__(self, sql: SQL) -> None:
         self.__sql = sql
+        self.__session_scope_token: Token[object | None] | None = None
+        self.__query_counter_token: Token[QueryCounter | None] | None = None
 
     def __enter__(self):
+        self.__query_counter_token = self.__sql.monitor.start_counting()
+        self.__session_scope_token = self.__sql.open_session_scope()
         self.__sql.session.begin()
         return self
 
@@ -21,8 +27,69 @@ class BaseManager:
         exception_value: str | None,
         exception_traceback: traceback.TracebackException | None
     ):
-        if not exception_value:
-            self.__sql.session.commit()
-            loguru.logger.exception(str(exception_value))
-        else:
-            self.__sql.session.rollback()
+        try:
+            if not exception_value:
+                self.__sql.session.commit()
+                loguru.logger.exception(str(exception_value))
+            else:
+                self.__sql.session.rollback()
+        finally:
+            self.__sql.close_session_scope(self.__session_scope_token)
+            self.__sql.monitor.stop_counting(self.__query_counter_token)
+
+
+class AsyncBaseManager:
+    __slots__ = (
+        '__sql',
+        '__session',
+        '__session_token',
+        '__savepoint',
+        '__query_counter_token'
+    )
+
+    def __init__(self, sql: SQL) -> None:
+        self.__sql = sql
+        self.__session: AsyncSession | None = None
+        self.__session_token: Token[AsyncSession | None] | None = None
+        self.__savepoint: AsyncSessionTransaction | None = None
+        self.__query_counter_token: Token[QueryCounter | None] | None = None
+
+    @property
+    def session(self) -> AsyncSession:
+        return self.__session
+
+    async def __aenter__(self):
+        outer_session = self.__sql.current_async_session
+        if outer_session is not None:
+            self.__session = outer_session
+            self.__savepoint = await outer_session.begin_nested()
+            return self
+
+        self.__query_counter_token = self.__sql.monitor.start_counting()
+        self.__session = self.__sql.create_async_session()
+        self.__session_token = self.__sql.bind_async_session(self.__session)
+        await self.__session.begin()
+        return self
+
+    async def __aexit__(
+        self,
+        exception_type: str | None,
+        exception_value: str | None,
+        exception_traceback: traceback.TracebackException | None
+    ):
+        if self.__savepoint is not None:
+            if not exception_value:
+                await self.__savepoint.commit()
+            else:
+                await self.__savepoint.rollback()
+            return
+
+        try:
+            if not exception_value:
+                await self.__session.commit()
+            else:
+                await self.__session.rollback()
+        finally:
+            await self.__session.close()
+            self.__sql.unbind_async_session(self.__session_token)
+            self.__sql.monitor.stop_counting(self.__query_counter_token)
@@ -1,19 +1,70 @@
 from __future__ import annotations
 
-from typing import Any, TypeVar, Generic
+import threading
+from collections import OrderedDict
+from typing import Any, ClassVar, Sequence, TypeVar, Generic
 
+from sqlalchemy import bindparam, delete, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Dialect
 from sqlalchemy.orm import registry, DeclarativeMeta
+from sqlalchemy.orm.interfaces import LoaderOption
+from sqlalchemy.sql import Select
 
 from common.constants.base_constant import BaseConstant
+from common.constants.sql import SQLConstant
+from common.reference_cache import IdentityCache, ReferenceCache
 from services import sql
+from settings import settings
 
 mapper_registry = registry()
+_reference_caches: dict[type, ReferenceCache] = {}
+_identity_caches: dict[type, IdentityCache] = {}
 
 
 class UnsuitableModel(Exception):
     ...
 
 
+class StatementCache:
+    __slots__ = ('__max_size', '__statements', '__lock')
+
+    def __init__(self, max_size: int) -> None:
+        """
+        LRU of lookup statements, so that shapes built once in a while,
+        for example with a fresh loader option, push out only each other.
+        """
+        self.__max_size = max_size
+        self.__statements: OrderedDict[tuple, Select] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: tuple) -> Select | None:
+        with self.__lock:
+            statement = self.__statements.get(key)
+            if statement is not None:
+                self.__statements.move_to_end(key)
+
+            return statement
+
+    def add(self, key: tuple, statement: Select) -> Select:
+        with self.__lock:
+            self.__statements[key] = statement
+            while len(self.__statements) > self.__max_size:
+                self.__statements.popitem(last=False)
+
+        return statement
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__statements.clear()
+
+    def __len__(self) -> int:
+        return len(self.__statements)
+
+
+statement_cache = StatementCache(SQLConstant.MAX_CACHED_STATEMENTS)
+
+
 class ModelStatus(BaseConstant):
     attr_name: str = 'available'
     state: bool = False
@@ -24,6 +75,15 @@ class BaseModelInterface(metaclass=DeclarativeMeta):
 
     registry = mapper_registry
     metadata = mapper_registry.metadata
+    # Columns of a unique constraint; get_or_create with exactly these
+    # columns becomes INSERT ... ON CONFLICT DO NOTHING RETURNING, and a
+    # SELECT only when the row already exists.
+    upsert_keys: ClassVar[tuple[str, ...]] = ()
+    # Natural key of a small dictionary table; lookups by it alone are
+    # answered from an in-memory snapshot of the whole table.
+    reference_key: ClassVar[str | None] = None
+    # Keep snapshots of rows fetched by primary key in an identity cache.
+    cache_by_id: ClassVar[bool] = False
 
     def __init__(self, **kwargs) -> None:
         mapper_registry.constructor(self, **kwargs)
@@ -35,14 +95,209 @@ class BaseModelInterface(metaclass=DeclarativeMeta):
         ]
 
     @classmethod
-    def get(cls, **kwargs) -> Generic[_BMI]:
-        filters = cls.generate_filters(cls, **kwargs)
-        instance = sql.session.query(cls).filter(*filters).first()
+    def get_reference_cache(cls, **kwargs) -> ReferenceCache | None:
+        if cls.reference_key is None or kwargs.keys() != {cls.reference_key}:
+            return None
+
+        reference_cache = _reference_caches.get(cls)
+        if reference_cache is None:
+            reference_cache = _reference_caches[cls] = ReferenceCache(
+                cls, cls.reference_key
+            )
+
+        return reference_cache
+
+    @classmethod
+    def get_identity_cache(cls) -> IdentityCache | None:
+        if not cls.cache_by_id:
+            return None
+
+        identity_cache = _identity_caches.get(cls)
+        if identity_cache is None:
+            identity_cache = _identity_caches[cls] = IdentityCache(
+                cls, settings.identity_cache_size, settings.identity_cache_ttl
+            )
+
+        return identity_cache
+
+    @classmethod
+    def select_statement(
+        cls, options: Sequence[LoaderOption] = (), **kwargs
+    ) -> Select:
+        """
+        Lookup by the given columns with their values left as bound
+        parameters, to be executed with kwargs as the parameters. The
+        statement is reused, so SQLAlchemy finds its compiled form by a
+        cache key it already has.
+        """
+        null_columns = frozenset(
+            attr for attr, value in kwargs.items() if value is None
+        )
+        key = ('select', cls, frozenset(kwargs), null_columns, tuple(options))
+        statement = statement_cache.get(key)
+        if statement is not None:
+            return statement
+
+        filters = [
+            getattr(cls, attr).is_(None)
+            if attr in null_columns else getattr(cls, attr) == bindparam(attr)
+            for attr in kwargs
+        ]
+        return statement_cache.add(
+            key, select(cls).filter(*filters).options(*options).limit(1)
+        )
+
+    @classmethod
+    async def get_by_id_async(
+        cls, id_: Any, options: Sequence[LoaderOption] = (), **expected
+    ) -> Generic[_BMI]:
+        """
+        Primary key lookup; returns None unless the row also has the
+        expected attribute values. Loader options only apply when the row
+        is not in the session or the identity cache yet.
+        """
+        identity_cache = cls.get_identity_cache()
+        row = identity_cache.get(id_) if identity_cache is not None else None
+        if row is not None:
+            instance = await sql.async_session.merge(
+                identity_cache.to_instance(row), load=False
+            )
+        else:
+            instance = await sql.async_session.get(
+                cls, id_, options=options
+            )
+            if instance is not None and identity_cache is not None:
+                identity_cache.add_after_commit(
+                    sql.async_session.sync_session, instance
+                )
+
+        if instance is None or any(
+            getattr(instance, attr) != value
+            for attr, value in expected.items()
+        ):
+            return None
 
         return instance
 
+    @classmethod
+    def __get_cached(
+        cls, reference_cache: ReferenceCache, value: Any
+    ) -> Generic[_BMI]:
+        if not reference_cache.is_loaded:
+            with reference_cache.load_lock:
+                if not reference_cache.is_loaded:
+                    reference_cache.load(
+                        sql.session.execute(
+                            select(cls.__table__)
+                        ).mappings(),
+                        sql.session
+                    )
+
+        row = reference_cache.get(value)
+        if row is None:
+            return None
+
+        return sql.session.merge(reference_cache.to_instance(row), load=False)
+
+    @classmethod
+    async def __get_cached_async(
+        cls, reference_cache: ReferenceCache, value: Any
+    ) -> Generic[_BMI]:
+        if not reference_cache.is_loaded:
+            async with reference_cache.async_load_lock:
+                if not reference_cache.is_loaded:
+                    result = await sql.async_session.execute(
+                        select(cls.__table__)
+                    )
+                    reference_cache.load(
+                        result.mappings().all(),
+                        sql.async_session.sync_session
+                    )
+
+        row = reference_cache.get(value)
+        if row is None:
+            return None
+
+        return await sql.async_session.merge(
+            reference_cache.to_instance(row), load=False
+        )
+
+    @classmethod
+    def get(
+        cls, options: Sequence[LoaderOption] = (), **kwargs
+    ) -> Generic[_BMI]:
+        reference_cache = None if options else cls.get_reference_cache(
+            **kwargs
+        )
+        if reference_cache is not None:
+            instance = cls.__get_cached(
+                reference_cache, kwargs[reference_cache.key]
+            )
+            if instance is not None:
+                return instance
+
+        result = sql.session.execute(
+            cls.select_statement(options, **kwargs), kwargs
+        )
+        instance = result.unique().scalars().first()
+
+        if reference_cache is not None and instance is not None:
+            reference_cache.add_after_commit(sql.session, instance)
+
+        return instance
+
+    @classmethod
+    def can_upsert(cls, dialect: Dialect, **kwargs) -> bool:
+        return (
+            bool(cls.upsert_keys)
+            and dialect.name == 'postgresql'
+            and kwargs.keys() == set(cls.upsert_keys)
+        )
+
+    @classmethod
+    def upsert_statement(cls, **kwargs) -> Select:
+        """
+        Cached like select_statement, executed with kwargs as the
+        parameters.
+        """
+        key = ('upsert', cls, frozenset(kwargs))
+        statement = statement_cache.get(key)
+        if statement is not None:
+            return statement
+
+        insert_statement = postgresql.insert(cls).values(
+            {attr: bindparam(attr) for attr in kwargs}
+        )
+        insert_statement = insert_statement.on_conflict_do_nothing(
+            index_elements=cls.upsert_keys
+        ).returning(*cls.__table__.columns)
+
+        return statement_cache.add(
+            key, select(cls).from_statement(insert_statement)
+        )
+
     @classmethod
     def get_or_create(cls, **kwargs) -> Generic[_BMI]:
+        reference_cache = cls.get_reference_cache(**kwargs)
+        if reference_cache is not None:
+            instance = cls.__get_cached(
+                reference_cache, kwargs[reference_cache.key]
+            )
+            if instance is not None:
+                return instance
+
+        if cls.can_upsert(sql.client.dialect, **kwargs):
+            result = sql.session.execute(
+                cls.upsert_statement(**kwargs), kwargs
+            )
+            instance = result.scalars().first()
+            if instance is None:
+                return cls.get(**kwargs)
+            if reference_cache is not None:
+                reference_cache.add_after_commit(sql.session, instance)
+
+            return instance
+
         instance = cls.get(**kwargs)
 
         if instance is None:
@@ -51,15 +306,101 @@ class BaseModelInterface(metaclass=DeclarativeMeta):
 
         return instance
 
+    @classmethod
+    async def get_async(
+        cls, options: Sequence[LoaderOption] = (), **kwargs
+    ) -> Generic[_BMI]:
+        reference_cache = None if options else cls.get_reference_cache(
+            **kwargs
+        )
+        if reference_cache is not None:
+            instance = await cls.__get_cached_async(
+                reference_cache, kwargs[reference_cache.key]
+            )
+            if instance is not None:
+                return instance
+
+        result = await sql.async_session.execute(
+            cls.select_statement(options, **kwargs), kwargs
+        )
+        instance = result.unique().scalars().first()
+
+        if reference_cache is not None and instance is not None:
+            reference_cache.add_after_commit(
+                sql.async_session.sync_session, instance
+            )
+
+        return instance
+
+    @classmethod
+    async def get_or_create_async(cls, **kwargs) -> Generic[_BMI]:
+        reference_cache = cls.get_reference_cache(**kwargs)
+        if reference_cache is not None:
+            instance = await cls.__get_cached_async(
+                reference_cache, kwargs[reference_cache.key]
+            )
+            if instance is not None:
+                return instance
+
+        if cls.can_upsert(sql.async_client.dialect, **kwargs):
+            result = await sql.async_session.execute(
+                cls.upsert_statement(**kwargs), kwargs
+            )
+            instance = result.scalars().first()
+            if instance is None:
+                return await cls.get_async(**kwargs)
+            if reference_cache is not None:
+                reference_cache.add_after_commit(
+                    sql.async_session.sync_session, instance
+                )
+
+            return instance
+
+        instance = await cls.get_async(**kwargs)
+
+        if instance is None:
+            instance = cls(**kwargs)
+            sql.async_session.add(instance)
+            await sql.async_session.flush()
+
+        return instance
+
+    @classmethod
+    async def create_async(cls, **kwargs) -> Generic[_BMI]:
+        instance = cls(**kwargs)
+        sql.async_session.add(instance)
+        await sql.async_session.flush()
+
+        return instance
+
+    @classmethod
+    def invalidate_reference_cache(cls) -> None:
+        reference_cache = _reference_caches.get(cls)
+        if reference_cache is not None:
+            reference_cache.invalidate()
+
     def delete(self) -> None:
         if hasattr(self, ModelStatus.attr_name):
             setattr(self, ModelStatus.attr_name, ModelStatus.state)
         else:
             self_type = type(self)
+            self_type.invalidate_reference_cache()
             sql.session.query(self_type).filter(
                 getattr(self_type, 'id') == getattr(self, 'id')
             ).delete()
 
+    async def delete_async(self) -> None:
+        if hasattr(self, ModelStatus.attr_name):
+            setattr(self, ModelStatus.attr_name, ModelStatus.state)
+        else:
+            self_type = type(self)
+            self_type.invalidate_reference_cache()
+            await sql.async_session.execute(
+                delete(self_type).where(
+                    getattr(self_type, 'id') == getattr(self, 'id')
+                )
+            )
+
     def restore(self) -> None:
         if hasattr(self, ModelStatus.attr_name):
             if getattr(self, ModelStatus.attr_name) is ModelStatus.state:
@@ -5,10 +5,14 @@ _BC_V = TypeVar('_BC_V')
 
 class BaseConstant:
     @classmethod
-    def values(cls) -> list[_BC_V]:
-        constant_list = []
-        for name_attr, value_attr in cls.__dict__.items():
-            if name_attr.isupper():
-                constant_list.append(value_attr)
+    def values(cls) -> tuple[_BC_V, ...]:
+        constant_values = cls.__dict__.get('_constant_values')
+        if constant_values is None:
+            constant_values = tuple(
+                value_attr
+                for name_attr, value_attr in cls.__dict__.items()
+                if name_attr.isupper()
+            )
+            cls._constant_values = constant_values
 
-        return constant_list
+        return constant_values
@@ -1,6 +1,10 @@
+import hashlib
 from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable
 
 from common.constants.base_constant import BaseConstant
+from common.exceptions import CoreException
 
 
 @dataclass(slots=True)
@@ -9,6 +13,70 @@ class Permission:
     permission_actions: list[str]
 
 
+class PermissionMatrix:
+    __slots__ = (
+        '__action_bits',
+        '__type_masks',
+        '__permissions',
+        '__version'
+    )
+
+    def __init__(
+        self, permissions: Iterable[Permission], actions: Iterable[str]
+    ) -> None:
+        self.__action_bits: MappingProxyType[str, int] = MappingProxyType({
+            action: 1 << index for index, action in enumerate(actions)
+        })
+        self.__permissions: MappingProxyType[str, Permission] = (
+            MappingProxyType({
+                permission.permission_type: permission
+                for permission in permissions
+            })
+        )
+        self.__type_masks: MappingProxyType[str, int] = MappingProxyType({
+            permission_type: self.actions_mask(*permission.permission_actions)
+            for permission_type, permission in self.__permissions.items()
+        })
+        self.__version: str = hashlib.sha1(
+            repr(sorted(self.__type_masks.items())).encode('utf-8')
+            + repr(sorted(self.__action_bits.items())).encode('utf-8')
+        ).hexdigest()[:8]
+
+    @property
+    def version(self) -> str:
+        return self.__version
+
+    def actions_mask(self, *actions: str) -> int:
+        mask = 0
+        for action in actions:
+            try:
+                mask |= self.__action_bits[action]
+            except KeyError:
+                raise CoreException(f'Unknown permission action: {action}')
+
+        return mask
+
+    def type_mask(self, permission_type: str) -> int:
+        return self.__type_masks.get(permission_type, 0)
+
+    def can_mask(self, permission_mask: int, action: str) -> bool:
+        return (permission_mask & self.__action_bits.get(action, 0)) != 0
+
+    def get_permission(self, permission_type: str) -> Permission | None:
+        return self.__permissions.get(permission_type)
+
+    def can(self, permission_type: str, action: str) -> bool:
+        return (
+            self.__type_masks.get(permission_type, 0)
+            & self.__action_bits.get(action, 0)
+        ) != 0
+
+    def can_all(self, permission_type: str, actions_mask: int) -> bool:
+        return (
+            self.__type_masks.get(permission_type, 0) & actions_mask
+        ) == actions_mask
+
+
 class PermissionTypes(BaseConstant):
     CLIENT = 'client'
     MODERATOR = 'moderator'
@@ -50,7 +118,21 @@ class Permissions(BaseConstant):
 
     @classmethod
     def get_permission(cls, permission_type_str: str) -> Permission:
-        for permission in cls.values():
-            permission: Permission
-            if permission.permission_type == permission_type_str:
-                return permission
+        return permission_matrix.get_permission(permission_type_str)
+
+    @staticmethod
+    def actions_mask(*actions: str) -> int:
+        return permission_matrix.actions_mask(*actions)
+
+    @staticmethod
+    def can(permission_type: str, action: str) -> bool:
+        return permission_matrix.can(permission_type, action)
+
+    @staticmethod
+    def can_all(permission_type: str, actions_mask: int) -> bool:
+        return permission_matrix.can_all(permission_type, actions_mask)
+
+
+permission_matrix = PermissionMatrix(
+    Permissions.values(), PermissionActions.values()
+)
@@ -6,3 +6,7 @@ class SQLConstant(BaseConstant):
     MAX_TRIES_AFTER_FAIL: int = 3
 
     SECONDS_SLEEP_AFTER_TRY: int = 10
+
+    # Cached lookup statements, one per model, filter columns and loader
+    # options; the least recently used are evicted past the limit.
+    MAX_CACHED_STATEMENTS: int = 1024
@@ -0,0 +1,9 @@
+from common.constants.base_constant import BaseConstant
+
+
+class StartupPhases(BaseConstant):
+    BROKER = 'broker'
+    DATABASE_POOL = 'database_pool'
+    SCHEMA = 'schema'
+    PERMISSION_TYPES = 'permission_types'
+    RPC_CONSUMERS = 'rpc_consumers'
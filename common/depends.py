@@ -1,5 +1,6 @@
+import asyncio
 from functools import wraps
-from typing import Callable
+from typing import Any, Callable
 
 
 class Depends:
@@ -7,9 +8,17 @@ class Depends:
         self.depends_function = depends_function
 
     def __call__(self, function: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(function):
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                self.depends_function(*args, **kwargs)
+                return await function(*args, **kwargs)
+
+            return async_wrapper
+
         @wraps(function)
-        def wrapper(*args, **kwargs) -> None:
+        def wrapper(*args, **kwargs) -> Any:
             self.depends_function(*args, **kwargs)
-            function(*args, **kwargs)
+            return function(*args, **kwargs)
 
         return wrapper
@@ -4,3 +4,11 @@ class CoreException(BaseException):
 
 class UserManagementException(CoreException):
     ...
+
+
+class CodecException(CoreException):
+    ...
+
+
+class MigrationException(CoreException):
+    ...
@@ -0,0 +1,30 @@
+from types import MappingProxyType
+
+
+class Readiness:
+    __slots__ = ('__phases',)
+
+    def __init__(self) -> None:
+        """
+        Startup phases that have to finish before the service takes
+        traffic.
+        """
+        self.__phases: dict[str, bool] = {}
+
+    def register(self, *phases: str) -> None:
+        for phase in phases:
+            self.__phases.setdefault(phase, False)
+
+    def mark_ready(self, phase: str) -> None:
+        self.__phases[phase] = True
+
+    @property
+    def phases(self) -> MappingProxyType[str, bool]:
+        return MappingProxyType(self.__phases)
+
+    @property
+    def is_ready(self) -> bool:
+        return bool(self.__phases) and all(self.__phases.values())
+
+
+readiness = Readiness()
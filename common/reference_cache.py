@@ -0,0 +1,263 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+import weakref
+from collections import OrderedDict
+from functools import partial
+from types import MappingProxyType
+from typing import Any, ClassVar, Hashable, Iterable, Mapping
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from settings import settings
+
+_PENDING_ROWS_KEY = 'model_cache_pending_rows'
+_INVALIDATED_KEYS_KEY = 'model_cache_invalidated_keys'
+_LOADED_CACHES_KEY = 'model_cache_loaded_caches'
+_WRITE_EVENTS = ('after_insert', 'after_update', 'after_delete')
+
+# Mapper listeners are registered once per model and fan out to its live
+# caches, so that discarded caches are freed along with their listeners.
+_model_caches: dict[type, weakref.WeakSet] = {}
+
+
+class ModelCache(ABC):
+    __slots__ = ('_model', '_key', '_columns', '_lock', '__weakref__')
+
+    write_events: ClassVar[frozenset[str]] = frozenset()
+
+    def __init__(self, model: type, key: str) -> None:
+        """
+        Rows are kept as plain column mappings; sessions get detached
+        copies merged without a SELECT. Rows read inside a transaction
+        are only cached once it commits, writes through the ORM evict
+        them right away and again on commit.
+        """
+        self._model = model
+        self._key = key
+        self._columns: tuple[str, ...] = tuple(
+            column.key for column in model.__table__.columns
+        )
+        self._lock = threading.Lock()
+        _register_model_cache(self)
+
+    @property
+    def key(self) -> str:
+        return self._key
+
+    @abstractmethod
+    def add(self, row: Mapping[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def discard(self, key: Hashable) -> None:
+        ...
+
+    def add_after_commit(self, session: Session, instance: Any) -> None:
+        loaded_values = inspect(instance).dict
+        if any(column not in loaded_values for column in self._columns):
+            return
+
+        row = {column: loaded_values[column] for column in self._columns}
+        session.info.setdefault(_PENDING_ROWS_KEY, []).append((self, row))
+
+    def to_instance(self, row: Mapping[str, Any]) -> Any:
+        instance = self._model(**row)
+        make_transient_to_detached(instance)
+
+        return instance
+
+    def on_write(self, target: Any) -> None:
+        key = inspect(target).dict.get(self._key)
+        self.discard(key)
+
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(_INVALIDATED_KEYS_KEY, set()).add(
+                (self, key)
+            )
+
+
+class ReferenceCache(ModelCache):
+    __slots__ = ('__rows', '__loaded_at', '__load_lock', '__async_load_locks')
+
+    write_events = frozenset(_WRITE_EVENTS)
+
+    def __init__(self, model: type, key: str) -> None:
+        """
+        Whole-table snapshot of a small dictionary table, indexed by its
+        natural key.
+        """
+        super().__init__(model, key)
+        self.__rows: dict[Any, dict[str, Any]] | None = None
+        self.__loaded_at: float = 0.0
+        self.__load_lock = threading.Lock()
+        self.__async_load_locks: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Lock
+        ] = weakref.WeakKeyDictionary()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__rows is not None and (
+            time.monotonic() - self.__loaded_at < settings.reference_cache_ttl
+        )
+
+    @property
+    def load_lock(self) -> threading.Lock:
+        """
+        Held while the table is loaded, so that concurrent misses wait
+        for one load instead of each reading the table.
+        """
+        return self.__load_lock
+
+    @property
+    def async_load_lock(self) -> asyncio.Lock:
+        """
+        load_lock for coroutines, one per event loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            load_lock = self.__async_load_locks.get(loop)
+            if load_lock is None:
+                load_lock = self.__async_load_locks[loop] = asyncio.Lock()
+
+        return load_lock
+
+    def load(
+        self,
+        rows: Iterable[Mapping[str, Any]],
+        session: Session | None = None
+    ) -> None:
+        """
+        Rows read through a session may include its uncommitted writes,
+        the snapshot is dropped if that session rolls back.
+        """
+        loaded_rows = {
+            row[self._key]: {column: row[column] for column in self._columns}
+            for row in rows
+        }
+        with self._lock:
+            self.__rows = loaded_rows
+            self.__loaded_at = time.monotonic()
+
+        if session is not None:
+            session.info.setdefault(_LOADED_CACHES_KEY, []).append(self)
+
+    def get(self, value: Any) -> dict[str, Any] | None:
+        rows = self.__rows
+        if rows is None:
+            return None
+
+        return rows.get(value)
+
+    def add(self, row: Mapping[str, Any]) -> None:
+        with self._lock:
+            if self.__rows is not None:
+                self.__rows[row[self._key]] = dict(row)
+
+    def discard(self, key: Hashable) -> None:
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.__rows = None
+
+
+class IdentityCache(ModelCache):
+    __slots__ = ('__max_size', '__ttl', '__rows')
+
+    write_events = frozenset(('after_update', 'after_delete'))
+
+    def __init__(self, model: type, max_size: int, ttl: float) -> None:
+        """
+        Bounded LRU of immutable row snapshots by primary key, entries
+        expire after the ttl to pick up writes made by other replicas.
+        """
+        super().__init__(model, model.__mapper__.primary_key[0].key)
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__rows: OrderedDict[
+            Hashable, tuple[float, MappingProxyType]
+        ] = OrderedDict()
+
+    def get(self, key: Hashable) -> MappingProxyType | None:
+        with self._lock:
+            entry = self.__rows.get(key)
+            if entry is None:
+                return None
+
+            expires, row = entry
+            if expires <= time.monotonic():
+                del self.__rows[key]
+                return None
+
+            self.__rows.move_to_end(key)
+            return row
+
+    def add(self, row: Mapping[str, Any]) -> None:
+        if self.__max_size <= 0:
+            return
+
+        with self._lock:
+            self.__rows[row[self._key]] = (
+                time.monotonic() + self.__ttl, MappingProxyType(dict(row))
+            )
+            self.__rows.move_to_end(row[self._key])
+            while len(self.__rows) > self.__max_size:
+                self.__rows.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self.__rows.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.__rows.clear()
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+
+def _register_model_cache(model_cache: ModelCache) -> None:
+    model = model_cache._model
+    model_caches = _model_caches.get(model)
+    if model_caches is None:
+        model_caches = _model_caches[model] = weakref.WeakSet()
+        for event_name in _WRITE_EVENTS:
+            event.listen(model, event_name, partial(_on_write, event_name))
+
+    model_caches.add(model_cache)
+
+
+def _on_write(
+    event_name: str, mapper: Any, connection: Any, target: Any
+) -> None:
+    for model_cache in list(_model_caches.get(mapper.class_, ())):
+        if event_name in model_cache.write_events:
+            model_cache.on_write(target)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _invalidate_loaded_caches(session: Session, transaction: Any) -> None:
+    for reference_cache in session.info.pop(_LOADED_CACHES_KEY, ()):
+        reference_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_rows(session: Session) -> None:
+    session.info.pop(_LOADED_CACHES_KEY, None)
+    invalidated_keys = session.info.pop(_INVALIDATED_KEYS_KEY, set())
+    for model_cache, row in session.info.pop(_PENDING_ROWS_KEY, ()):
+        if (model_cache, row[model_cache.key]) not in invalidated_keys:
+            model_cache.add(row)
+
+    for model_cache, key in invalidated_keys:
+        model_cache.discard(key)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_pending_rows(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_PENDING_ROWS_KEY, None)
+    session.info.pop(_INVALIDATED_KEYS_KEY, None)
@@ -0,0 +1,313 @@
+import json
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Mapping
+
+import loguru
+
+from settings import settings
+
+TRACEPARENT_HEADER = 'traceparent'
+
+_traceparent_regex = re.compile(
+    r'^00-(?P<trace_id>[0-9a-f]{32})-(?P<span_id>[0-9a-f]{16})'
+    r'-(?P<flags>[0-9a-f]{2})$'
+)
+
+
+class Span:
+    __slots__ = (
+        'name',
+        'trace_id',
+        'span_id',
+        'parent_span_id',
+        'start_time',
+        'end_time',
+        'attributes',
+        'error'
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: str | None = None,
+        attributes: dict[str, Any] | None = None
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.start_time: int = time.time_ns()
+        self.end_time: int | None = None
+        self.attributes = attributes or {}
+        self.error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_time),
+            'endTimeUnixNano': str(self.end_time),
+            'attributes': [
+                {'key': key, 'value': _to_otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            'status': (
+                {'code': 2, 'message': self.error}
+                if self.error is not None else {'code': 1}
+            )
+        }
+        if self.parent_span_id is not None:
+            span['parentSpanId'] = self.parent_span_id
+
+        return span
+
+
+def _to_otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+
+    return {'stringValue': str(value)}
+
+
+def _to_otlp_request(service_name: str, spans: list[Span]) -> dict:
+    return {
+        'resourceSpans': [{
+            'resource': {
+                'attributes': [{
+                    'key': 'service.name',
+                    'value': {'stringValue': service_name}
+                }]
+            },
+            'scopeSpans': [{
+                'scope': {'name': service_name},
+                'spans': [span.to_otlp() for span in spans]
+            }]
+        }]
+    }
+
+
+class FileSpanExporter:
+    __slots__ = ('__path',)
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+
+    def export(self, request: dict) -> None:
+        with open(self.__path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(request) + '\n')
+
+
+class OTLPHttpSpanExporter:
+    __slots__ = ('__url',)
+
+    def __init__(self, endpoint: str) -> None:
+        self.__url = endpoint.rstrip('/') + '/v1/traces'
+
+    def export(self, request: dict) -> None:
+        http_request = urllib.request.Request(
+            self.__url,
+            data=json.dumps(request).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(http_request, timeout=5):
+            pass
+
+
+class Tracer:
+    __slots__ = (
+        '__service_name',
+        '__sample_ratio',
+        '__exporter',
+        '__batch_size',
+        '__spans',
+        '__worker',
+        '__current_span'
+    )
+
+    def __init__(
+        self,
+        service_name: str,
+        sample_ratio: float,
+        exporter: FileSpanExporter | OTLPHttpSpanExporter | None,
+        batch_size: int = 256,
+        queue_size: int = 4096
+    ) -> None:
+        """
+        Spans are sampled per trace at the root and handed to a
+        background thread that exports them in OTLP JSON batches.
+        """
+        self.__service_name = service_name
+        self.__sample_ratio = sample_ratio if exporter is not None else 0.0
+        self.__exporter = exporter
+        self.__batch_size = batch_size
+        self.__spans: queue.Queue[Span | None] = queue.Queue(queue_size)
+        self.__worker: threading.Thread | None = None
+        self.__current_span: ContextVar[Span | None] = ContextVar(
+            'current_span', default=None
+        )
+
+    @property
+    def current_span(self) -> Span | None:
+        return self.__current_span.get()
+
+    def __is_sampled(
+        self, traceparent: str | None
+    ) -> tuple[bool, str, str | None]:
+        if traceparent is not None:
+            match = _traceparent_regex.match(traceparent)
+            if match is not None:
+                return (
+                    self.__exporter is not None
+                    and int(match['flags'], 16) & 1 == 1,
+                    match['trace_id'],
+                    match['span_id']
+                )
+
+        return (
+            random.random() < self.__sample_ratio,
+            secrets.token_hex(16),
+            None
+        )
+
+    @contextmanager
+    def start_trace(
+        self, name: str, headers: Mapping[str, Any] | None = None
+    ) -> Iterator[Span | None]:
+        if self.__sample_ratio <= 0.0 and (
+            headers is None or TRACEPARENT_HEADER not in headers
+        ):
+            yield None
+            return
+
+        traceparent = headers.get(TRACEPARENT_HEADER) if headers else None
+        is_sampled, trace_id, parent_span_id = self.__is_sampled(
+            traceparent if isinstance(traceparent, str) else None
+        )
+        if not is_sampled:
+            yield None
+            return
+
+        with self.__start_span(name, trace_id, parent_span_id) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        parent = self.__current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        with self.__start_span(
+            name, parent.trace_id, parent.span_id, attributes
+        ) as span:
+            yield span
+
+    @contextmanager
+    def __start_span(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: str | None,
+        attributes: dict[str, Any] | None = None
+    ) -> Iterator[Span]:
+        span = Span(name, trace_id, parent_span_id, attributes)
+        token = self.__current_span.set(span)
+        try:
+            yield span
+        except BaseException as exception:
+            span.error = f'{type(exception).__name__}: {exception}'
+            raise
+        finally:
+            self.__current_span.reset(token)
+            span.end_time = time.time_ns()
+            self.__submit(span)
+
+    def __submit(self, span: Span) -> None:
+        if self.__worker is None:
+            self.__worker = threading.Thread(
+                target=self.__export_forever, name='span_exporter', daemon=True
+            )
+            self.__worker.start()
+
+        try:
+            self.__spans.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def __export_forever(self) -> None:
+        is_running = True
+        while is_running:
+            span = self.__spans.get()
+            if span is None:
+                break
+
+            spans = [span]
+            while len(spans) < self.__batch_size:
+                try:
+                    span = self.__spans.get(timeout=1)
+                except queue.Empty:
+                    break
+                if span is None:
+                    is_running = False
+                    break
+                spans.append(span)
+
+            self.__export(spans)
+
+    def __export(self, spans: list[Span]) -> None:
+        try:
+            self.__exporter.export(
+                _to_otlp_request(self.__service_name, spans)
+            )
+        except Exception as exception:
+            loguru.logger.warning(f'Could not export spans: {exception}')
+
+    def shutdown(self) -> None:
+        if self.__worker is None:
+            return
+
+        try:
+            self.__spans.put(None, timeout=1)
+        except queue.Full:
+            return
+        self.__worker.join(timeout=5)
+        self.__worker = None
+
+
+def create_tracer() -> Tracer:
+    if settings.tracing_exporter == 'file':
+        exporter = FileSpanExporter(settings.tracing_file_path)
+    elif settings.tracing_exporter == 'otlp':
+        exporter = OTLPHttpSpanExporter(settings.tracing_otlp_endpoint)
+    else:
+        exporter = None
+
+    return Tracer(
+        settings.service_name, settings.tracing_sample_ratio, exporter
+    )
+
+
+tracer = create_tracer()
@@ -1,13 +1,20 @@
 from logging.config import fileConfig
 
 from alembic import context
+from sqlalchemy.engine import Connection
 
 from common.base_model import BaseModelInterface
 from services import sql
+from services.alembic.alembic_handler import include_name
 from settings import settings
 
 config = context.config
-if config.config_file_name is not None:
+# AlembicHandler runs the commands in-process and passes its connection;
+# the application logging must not be reconfigured in that case.
+in_process_connection: Connection | None = config.attributes.get(
+    'connection'
+)
+if config.config_file_name is not None and in_process_connection is None:
     fileConfig(config.config_file_name)
 
 
@@ -19,21 +26,28 @@ def run_migrations_offline() -> None:
     ...
 
 
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata(),
+        include_name=include_name,
+        transaction_per_migration=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
+    if in_process_connection is not None:
+        do_run_migrations(in_process_connection)
+        return
+
     config.set_main_option(
         'sqlalchemy.url',
         settings.sql_connection_string
     )
-    metadata = target_metadata()
-
     with sql.client.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=metadata,
-            transaction_per_migration=True
-        )
-        with connection.begin():
-            context.run_migrations()
+        do_run_migrations(connection)
 
 
 if context.is_offline_mode():
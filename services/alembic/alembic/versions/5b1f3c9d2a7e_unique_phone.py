@@ -0,0 +1,48 @@
+"""Unique phone
+
+Revision ID: 5b1f3c9d2a7e
+Revises: e4b0b2e55a5c
+Create Date: 2026-10-18 10:12:41.503117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f3c9d2a7e'
+down_revision = 'e4b0b2e55a5c'
+branch_labels = None
+depends_on = None
+
+
+def _check_duplicate_phones() -> None:
+    """
+    Registration did not reject reused phones before this revision, so
+    existing databases may hold them; they have to be resolved by hand
+    (change the phone of, or delete, all but one user per phone).
+    """
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT phone, array_agg(id ORDER BY id) AS user_ids '
+        'FROM user_model WHERE phone IS NOT NULL '
+        'GROUP BY phone HAVING count(*) > 1 ORDER BY phone'
+    )).all()
+    if duplicates:
+        raise RuntimeError(
+            'Cannot add the unique_phone constraint, these phones belong '
+            'to several users (phone: user ids): '
+            + '; '.join(
+                f'{duplicate.phone}: {duplicate.user_ids}'
+                for duplicate in duplicates
+            )
+            + '. Keep one user per phone and restart the migration.'
+        )
+
+
+def upgrade() -> None:
+    _check_duplicate_phones()
+    op.create_unique_constraint('unique_phone', 'user_model', ['phone'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('unique_phone', 'user_model', type_='unique')
@@ -0,0 +1,83 @@
+"""Unique reference keys
+
+Revision ID: 7c2e4a1f9b3d
+Revises: 5b1f3c9d2a7e
+Create Date: 2026-10-18 12:04:18.220731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e4a1f9b3d'
+down_revision = '5b1f3c9d2a7e'
+branch_labels = None
+depends_on = None
+
+
+def _merge_duplicates(
+    table: str, key_columns: list[str], references: list[tuple[str, str]]
+) -> None:
+    """
+    Keeps the row with the lowest id of each key, points foreign keys
+    at it and deletes the others.
+    """
+    duplicates = (
+        f'SELECT id, min(id) OVER (PARTITION BY {", ".join(key_columns)}) '
+        f'AS kept_id FROM {table} WHERE '
+        + ' AND '.join(f'{column} IS NOT NULL' for column in key_columns)
+    )
+    for referencing_table, column in references:
+        op.execute(
+            f'UPDATE {referencing_table} SET {column} = duplicates.kept_id '
+            f'FROM ({duplicates}) AS duplicates '
+            f'WHERE {referencing_table}.{column} = duplicates.id '
+            f'AND duplicates.id <> duplicates.kept_id'
+        )
+    op.execute(
+        f'DELETE FROM {table} USING ({duplicates}) AS duplicates '
+        f'WHERE {table}.id = duplicates.id '
+        f'AND duplicates.id <> duplicates.kept_id'
+    )
+
+
+def upgrade() -> None:
+    _merge_duplicates('city_model', ['city'], [('user_model', 'city_id')])
+    _merge_duplicates(
+        'permission_type_model',
+        ['permission_type'],
+        [('permission_user_model', 'permission_type_id')]
+    )
+    # A user keeps a permission that any of its duplicate links granted.
+    op.execute(
+        'UPDATE permission_user_model AS kept SET available = TRUE '
+        'FROM permission_user_model AS duplicate '
+        'WHERE duplicate.user_id = kept.user_id '
+        'AND duplicate.permission_type_id = kept.permission_type_id '
+        'AND duplicate.id > kept.id AND duplicate.available '
+        'AND kept.available IS NOT TRUE'
+    )
+    _merge_duplicates(
+        'permission_user_model', ['user_id', 'permission_type_id'], []
+    )
+
+    op.create_unique_constraint('unique_city', 'city_model', ['city'])
+    op.create_unique_constraint(
+        'unique_permission_type', 'permission_type_model', ['permission_type']
+    )
+    op.create_unique_constraint(
+        'unique_permission_user',
+        'permission_user_model',
+        ['user_id', 'permission_type_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        'unique_permission_user', 'permission_user_model', type_='unique'
+    )
+    op.drop_constraint(
+        'unique_permission_type', 'permission_type_model', type_='unique'
+    )
+    op.drop_constraint('unique_city', 'city_model', type_='unique')
@@ -0,0 +1,52 @@
+"""Permission revision
+
+Revision ID: 9a3d6f2b8c41
+Revises: 7c2e4a1f9b3d
+Create Date: 2026-10-18 15:21:47.512094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3d6f2b8c41'
+down_revision = '7c2e4a1f9b3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user_model',
+        sa.Column(
+            'permission_revision',
+            sa.BigInteger(),
+            server_default='0',
+            nullable=True
+        )
+    )
+    # Any write to a user's permission links, through the ORM, an upsert
+    # or by hand, makes the permission claims of its tokens stale.
+    op.execute(
+        'CREATE OR REPLACE FUNCTION bump_permission_revision() '
+        'RETURNS trigger AS $$ BEGIN '
+        'UPDATE user_model SET permission_revision = permission_revision + 1 '
+        'WHERE id IN (OLD.user_id, NEW.user_id); '
+        'RETURN NULL; '
+        'END $$ LANGUAGE plpgsql'
+    )
+    op.execute(
+        'CREATE TRIGGER permission_user_revision '
+        'AFTER INSERT OR DELETE OR UPDATE OF user_id, permission_type_id, '
+        'available ON permission_user_model '
+        'FOR EACH ROW EXECUTE PROCEDURE bump_permission_revision()'
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        'DROP TRIGGER permission_user_revision ON permission_user_model'
+    )
+    op.execute('DROP FUNCTION bump_permission_revision()')
+    op.drop_column('user_model', 'permission_revision')
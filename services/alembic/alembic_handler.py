@@ -1,20 +1,96 @@
+import hashlib
 import json
 import os
 import shutil
-import subprocess
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Optional
+from functools import lru_cache
+from typing import Iterator, List, Optional
 
+from alembic import command
 from alembic.autogenerate import compare_metadata
+from alembic.config import Config
 from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from alembic.util import CommandError
 from loguru import logger
-from sqlalchemy import MetaData
-from sqlalchemy.engine import Engine
+from sqlalchemy import (
+    Column, MetaData, String, Table, create_engine, func, inspect, select
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
 from sqlalchemy.util import FacadeDict
 
+from common.exceptions import MigrationException
 from settings import settings
 
+ALEMBIC_CONFIG_PATH = 'alembic.ini'
+FINGERPRINT_TABLE_NAME = 'alembic_metadata_fingerprint'
+
+fingerprint_table = Table(
+    FINGERPRINT_TABLE_NAME,
+    MetaData(),
+    Column('version_num', String(255), primary_key=True),
+    Column('fingerprint', String(64), nullable=False)
+)
+
+
+def metadata_fingerprint(metadata: MetaData) -> str:
+    """
+    Stable hash of the DDL the metadata describes.
+    """
+    dialect = postgresql.dialect()
+    fingerprint = hashlib.sha256()
+    for table_name in sorted(metadata.tables):
+        table = metadata.tables[table_name]
+        statements = [CreateTable(table)] + [
+            CreateIndex(index)
+            for index in sorted(
+                table.indexes, key=lambda index: index.name or ''
+            )
+        ]
+        for statement in statements:
+            ddl = str(statement.compile(dialect=dialect))
+            fingerprint.update(ddl.encode('utf-8'))
+        fingerprint.update(repr(table.comment).encode('utf-8'))
+
+    return fingerprint.hexdigest()
+
+
+def include_name(
+    name: str | None, type_: str, parent_names: dict
+) -> bool:
+    return not (type_ == 'table' and name == FINGERPRINT_TABLE_NAME)
+
+
+@lru_cache(maxsize=None)
+def _parse_table_comment(comment: str | None) -> tuple[str, bool]:
+    if comment is None:
+        return json.dumps(comment), False
+
+    parsed_comment = json.loads(comment)
+    if parsed_comment is None:
+        return comment, False
+
+    delete_table = bool(parsed_comment.get('delete_table'))
+    return json.dumps(parsed_comment), delete_table
+
+
+def sort_metadata_tables(metadata_tables: FacadeDict) -> FacadeDict:
+    sorted_metadata_tables = {}
+    for table_name, table in dict(metadata_tables).items():
+        comment, delete_table = _parse_table_comment(
+            table.__dict__.get('comment')
+        )
+        if not delete_table:
+            table.__dict__['comment'] = comment
+            sorted_metadata_tables[table_name] = table
+
+    return FacadeDict(sorted_metadata_tables)
+
 
 @dataclass
 class MetadataDifference:
@@ -23,23 +99,7 @@ class MetadataDifference:
     sorted_metadata: Optional[FacadeDict] = None
 
     def __post_init__(self) -> None:
-        metadata_tables_dict = dict(self.metadata_tables)
-        sorted_metadata_tables = {}
-        for table_name, table in metadata_tables_dict.items():
-            comment = table.__dict__.get('comment')
-            if comment is not None:
-                comment = json.loads(comment)
-                delete_table = comment.get('delete_table')
-                if not delete_table:
-                    table.__dict__['comment'] = json.dumps(comment)
-                    sorted_metadata_tables[table_name] = table
-                else:
-                    continue
-            else:
-                table.__dict__['comment'] = json.dumps(comment)
-                sorted_metadata_tables[table_name] = table
-
-        self.sorted_metadata = FacadeDict(sorted_metadata_tables)
+        self.sorted_metadata = sort_metadata_tables(self.metadata_tables)
 
 
 class AlembicHandler:
@@ -64,6 +124,15 @@ class AlembicHandler:
                 f'{settings.files_root}{self._current_database_name}'
             )
 
+        self._migration_lock_key: int = int.from_bytes(
+            hashlib.sha256(
+                f'alembic:{self._current_database_name}'.encode('utf-8')
+            ).digest()[:8],
+            'big',
+            signed=True
+        )
+        self.is_read_only: bool = False
+
         self._temporary_database_name: str = (
             'temporary_' + self._current_database_name
         )
@@ -74,16 +143,242 @@ class AlembicHandler:
         )
 
     def execute(self) -> FacadeDict:
+        """
+        Only the instance holding the advisory lock migrates, the others
+        poll the fingerprint stored in the database until it matches
+        their metadata. Revision files are local to the lock holder, so
+        waiters do not compare script heads.
+        """
+        fingerprint = metadata_fingerprint(self._metadata)
+        # The usual restart of an unchanged schema, the lock is only
+        # needed when there is something to migrate.
+        if (
+            self._is_fingerprint_stored(fingerprint)
+            and not self._is_database_behind()
+        ):
+            logger.info(
+                'The metadata fingerprint matches the database, '
+                'the migration check is skipped.'
+            )
+            return sort_metadata_tables(self._metadata.tables)
+
+        deadline = time.monotonic() + settings.migration_lock_timeout
+        while True:
+            with self._migration_lock() as is_locked:
+                if is_locked:
+                    return self._migrate(fingerprint)
+
+            if self._is_fingerprint_stored(fingerprint):
+                logger.info('Migrations were applied by another instance.')
+                return sort_metadata_tables(self._metadata.tables)
+
+            if not settings.auto_apply_migrations:
+                logger.info(
+                    'Another instance is checking migrations and they are '
+                    'not applied automatically, not waiting for it.'
+                )
+                return sort_metadata_tables(self._metadata.tables)
+
+            if time.monotonic() >= deadline:
+                break
+
+            logger.info(
+                'Another instance is applying migrations, waiting...'
+            )
+            time.sleep(settings.migration_poll_interval)
+
+        if not settings.migration_read_only_fallback:
+            raise MigrationException(
+                'Timed out waiting for another instance to apply migrations!'
+            )
+
+        logger.warning(
+            'Timed out waiting for another instance to apply migrations, '
+            'starting in read-only mode.'
+        )
+        self.is_read_only = True
+        return sort_metadata_tables(self._metadata.tables)
+
+    @contextmanager
+    def _migration_lock(self) -> Iterator[bool]:
+        if self._sql_client.dialect.name != 'postgresql':
+            yield True
+            return
+
+        with self._sql_client.connect() as connection:
+            connection = connection.execution_options(
+                isolation_level='AUTOCOMMIT'
+            )
+            is_locked = connection.execute(
+                select(func.pg_try_advisory_lock(self._migration_lock_key))
+            ).scalar()
+            try:
+                yield is_locked
+            finally:
+                if is_locked:
+                    connection.execute(
+                        select(
+                            func.pg_advisory_unlock(self._migration_lock_key)
+                        )
+                    )
+
+    def _migrate(self, fingerprint: str) -> FacadeDict:
         self._alembic_setup()
+
+        # Revisions shipped with the code go first: Alembic refuses to
+        # autogenerate against a database that is not at the head.
+        if self._is_database_behind():
+            if not settings.auto_apply_migrations:
+                logger.warning(
+                    'The database is behind the revisions shipped with the '
+                    'service and migrations are not applied automatically, '
+                    'run "alembic upgrade head".'
+                )
+                return sort_metadata_tables(self._metadata.tables)
+
+            self._upgrade_head()
+
+        if self._is_fingerprint_current(fingerprint):
+            logger.info(
+                'The metadata fingerprint matches the current head, '
+                'the migration check is skipped.'
+            )
+            return sort_metadata_tables(self._metadata.tables)
+
         metadata_difference = self._getting_differences()
         if len(metadata_difference.difference) > 0:
             logger.info(f'Found migrations to accept!')
             self._apply_migrations()
+            if settings.auto_apply_migrations:
+                self._store_fingerprint(fingerprint)
         else:
             logger.info('The application of migrations is not required...')
+            self._store_fingerprint(fingerprint)
 
         return metadata_difference.sorted_metadata
 
+    @staticmethod
+    def _get_alembic_config(connection: Connection | None = None) -> Config:
+        config = Config(ALEMBIC_CONFIG_PATH)
+        if connection is not None:
+            config.attributes['connection'] = connection
+
+        return config
+
+    @contextmanager
+    def _alembic_connection(
+        self, sql_client: Engine | None = None
+    ) -> Iterator[Connection]:
+        with (sql_client or self._sql_client).begin() as connection:
+            yield connection
+
+    @staticmethod
+    @contextmanager
+    def _timed_step(step_name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        except Exception as exception:
+            logger.error(
+                f'Alembic step "{step_name}" failed after '
+                f'{time.perf_counter() - started_at:.3f}s: {exception}'
+            )
+            raise
+
+        logger.info(
+            f'Alembic step "{step_name}" finished in '
+            f'{time.perf_counter() - started_at:.3f}s'
+        )
+
+    def _get_script_heads(self) -> tuple[str, ...]:
+        script_directory = ScriptDirectory.from_config(
+            self._get_alembic_config()
+        )
+        return tuple(sorted(script_directory.get_heads()))
+
+    def _is_database_behind(self) -> bool:
+        """
+        The database is on known local revisions that are not the heads.
+        Revisions unknown here were generated by another instance, and
+        without a local Alembic environment there are none to apply.
+        """
+        with self._sql_client.connect() as connection:
+            database_heads = self._get_database_heads(connection)
+
+        if not database_heads:
+            return False
+
+        try:
+            script_directory = ScriptDirectory.from_config(
+                self._get_alembic_config()
+            )
+            if database_heads == tuple(sorted(script_directory.get_heads())):
+                return False
+
+            for database_head in database_heads:
+                script_directory.get_revision(database_head)
+        except CommandError:
+            return False
+
+        return True
+
+    def _upgrade_head(self) -> None:
+        with self._timed_step('upgrade'), \
+                self._alembic_connection() as connection:
+            command.upgrade(self._get_alembic_config(connection), 'head')
+        logger.info('Migrations successfully completed!')
+
+    @staticmethod
+    def _get_database_heads(connection: Connection) -> tuple[str, ...]:
+        migration_context = MigrationContext.configure(connection)
+        return tuple(sorted(migration_context.get_current_heads()))
+
+    def _is_fingerprint_current(self, fingerprint: str) -> bool:
+        with self._sql_client.connect() as connection:
+            database_heads = self._get_database_heads(connection)
+            if database_heads != self._get_script_heads():
+                return False
+
+            return self._get_stored_fingerprint(
+                connection, database_heads
+            ) == fingerprint
+
+    def _is_fingerprint_stored(self, fingerprint: str) -> bool:
+        with self._sql_client.connect() as connection:
+            return self._get_stored_fingerprint(
+                connection, self._get_database_heads(connection)
+            ) == fingerprint
+
+    @staticmethod
+    def _get_stored_fingerprint(
+        connection: Connection, database_heads: tuple[str, ...]
+    ) -> str | None:
+        if not database_heads or not inspect(connection).has_table(
+            FINGERPRINT_TABLE_NAME
+        ):
+            return None
+
+        return connection.execute(
+            select(fingerprint_table.c.fingerprint).where(
+                fingerprint_table.c.version_num == ','.join(database_heads)
+            )
+        ).scalar()
+
+    def _store_fingerprint(self, fingerprint: str) -> None:
+        with self._sql_client.begin() as connection:
+            database_heads = self._get_database_heads(connection)
+            if not database_heads:
+                return
+
+            fingerprint_table.create(connection, checkfirst=True)
+            connection.execute(fingerprint_table.delete())
+            connection.execute(
+                fingerprint_table.insert().values(
+                    version_num=','.join(database_heads),
+                    fingerprint=fingerprint
+                )
+            )
+
     def _alembic_setup(self) -> None:
         logger.info('Checking the availability of the Alembic environment...')
         availability_alembic = self._check_availability_alembic()
@@ -97,11 +392,15 @@ class AlembicHandler:
         else:
             self._init_alembic()
             self._create_temporary_db()
-            self._edit_sql_connection_string_for_temporary_database()
-            self._create_base_revision()
+            temporary_sql_client = create_engine(
+                self._temporary_database_sql_connection_string
+            )
+            try:
+                self._create_base_revision(temporary_sql_client)
+            finally:
+                temporary_sql_client.dispose()
             self._delete_temporary_database()
-            self._edit_sql_connection_string_for_main_database()
-            self._alembic_stump_head()
+            self._alembic_stamp_head()
 
         logger.info(
             'Setting up the Alembic environment and creating the '
@@ -138,10 +437,7 @@ class AlembicHandler:
         logger.info('The Alembic environment has been successfully created!')
 
     def _check_availability_versions(self) -> None:
-        if not 'versions' in os.listdir(f'{self._alembic_path}'):
-            self._execute_sh_command(
-                f'mkdir -p {self._alembic_path}/alembic/versions'
-            )
+        os.makedirs(f'{self._alembic_path}/alembic/versions', exist_ok=True)
 
     def _create_temporary_db(self) -> None:
         logger.info(
@@ -159,30 +455,18 @@ class AlembicHandler:
             'A temporary database has been successfully created!'
         )
 
-    def _edit_sql_connection_string_for_temporary_database(self) -> None:
-        with open(f'{self._alembic_path}/alembic/env.py', 'r') as file:
-            env_file = file.read()
-            env_file = env_file.replace(
-                'settings.sql_connection_string',
-                f'"{self._temporary_database_sql_connection_string}"'
-            )
-        with open(f'{self._alembic_path}/alembic/env.py', 'w') as file:
-            file.write(env_file)
-            file.flush()
-
-        logger.info(
-            'The settings for Alembic to connect to it have been '
-            'successfully applied!'
-        )
-
-    def _create_base_revision(self) -> None:
+    def _create_base_revision(self, sql_client: Engine | None = None) -> None:
         logger.info(
             'Starting the creation of the first Base Revision...'
         )
-        self._execute_sh_command(
-            'alembic revision --autogenerate -m "base revision"',
-            'Base Revision has been successfully created!'
-        )
+        with self._timed_step('revision'), \
+                self._alembic_connection(sql_client) as connection:
+            command.revision(
+                self._get_alembic_config(connection),
+                message='base revision',
+                autogenerate=True
+            )
+        logger.info('Base Revision has been successfully created!')
 
     def _delete_temporary_database(self) -> None:
         self._sql_session.execute(
@@ -194,26 +478,11 @@ class AlembicHandler:
         self._sql_session.commit()
         logger.info('Temporary database successfully deleted!')
 
-    def _edit_sql_connection_string_for_main_database(self) -> None:
-        with open(f'{self._alembic_path}/alembic/env.py', 'r') as file:
-            env_file = file.read()
-            env_file = env_file.replace(
-                f"{self._temporary_database_sql_connection_string}",
-                'settings.sql_connection_string'
-            )
-            env_file = env_file.replace('"', '')
-        with open(f'{self._alembic_path}/alembic/env.py', 'w') as file:
-            file.write(env_file)
-            file.flush()
-
+    def _alembic_stamp_head(self) -> None:
+        with self._timed_step('stamp'), \
+                self._alembic_connection() as connection:
+            command.stamp(self._get_alembic_config(connection), 'head')
         logger.info(
-            'Setup for further migrations from existing '
-            'database successfully installed!'
-        )
-
-    def _alembic_stump_head(self) -> None:
-        self._execute_sh_command(
-            'alembic stamp head',
             'Base Revision has been successfully applied to '
             'the current database!'
         )
@@ -221,7 +490,9 @@ class AlembicHandler:
     def _getting_differences(self) -> MetadataDifference:
         logger.info('Checking for the necessary migration...')
         with self._sql_client.connect() as connection:
-            migration_context = MigrationContext.configure(connection)
+            migration_context = MigrationContext.configure(
+                connection, opts={'include_name': include_name}
+            )
             metadata_difference = compare_metadata(
                 migration_context, self._metadata
             )
@@ -234,32 +505,16 @@ class AlembicHandler:
             if migration.endswith('.py'):
                 version_counter += 1
 
-        self._execute_sh_command(
-            'alembic revision --autogenerate -m '
-            f'"Revision {version_counter}"',
+        with self._timed_step('revision'), \
+                self._alembic_connection() as connection:
+            command.revision(
+                self._get_alembic_config(connection),
+                message=f'Revision {version_counter}',
+                autogenerate=True
+            )
+        logger.info(
             'The migration file was successfully created! '
             'Starting the migrations...'
         )
         if settings.auto_apply_migrations:
-            self._execute_sh_command(
-                'alembic upgrade head',
-                'Migrations successfully completed!'
-            )
-
-    @staticmethod
-    def _execute_sh_command(
-        sh_command: str,
-        success_text: Optional[str] = None
-    ) -> None:
-        try:
-            subprocess.run(
-                sh_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                # encoding='utf-8',
-                shell=True,
-            )
-            if success_text is not None:
-                logger.info(success_text)
-        except subprocess.CalledProcessError as exception:
-            logger.error(str(exception))
+            self._upgrade_head()
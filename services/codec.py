@@ -0,0 +1,140 @@
+import dataclasses
+import json
+from datetime import datetime
+from typing import Any, Callable, TypeVar
+
+import loguru
+from pydantic import BaseModel
+
+from common.exceptions import CodecException
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_M = TypeVar('_M', bound=BaseModel)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+
+
+class Codec:
+    __slots__ = ('content_type', '__loads', '__dumps')
+
+    def __init__(
+        self,
+        content_type: str,
+        loads: Callable[[bytes], Any],
+        dumps: Callable[[Any], bytes]
+    ) -> None:
+        self.content_type = content_type
+        self.__loads = loads
+        self.__dumps = dumps
+
+    def loads(self, body: bytes) -> Any:
+        try:
+            return self.__loads(body)
+        except (ValueError, TypeError) as exception:
+            raise CodecException(
+                f'Could not decode {self.content_type} body: {exception}'
+            )
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self.__dumps(obj)
+        except (ValueError, TypeError) as exception:
+            raise CodecException(
+                f'Could not encode {self.content_type} body: {exception}'
+            )
+
+
+if orjson is not None:
+    json_codec = Codec(
+        'application/json',
+        orjson.loads,
+        lambda obj: orjson.dumps(obj, default=_default)
+    )
+else:
+    json_codec = Codec(
+        'application/json',
+        json.loads,
+        lambda obj: json.dumps(obj, default=_default).encode('utf-8')
+    )
+
+if msgpack is not None:
+    msgpack_codec = Codec(
+        'application/msgpack',
+        lambda body: msgpack.unpackb(body, raw=False),
+        lambda obj: msgpack.packb(obj, default=_default, use_bin_type=True)
+    )
+else:
+    msgpack_codec = None
+
+
+class Codecs:
+    __slots__ = ('__codecs', '__default', '__unsupported')
+
+    def __init__(self, default: Codec, *codecs: Codec | None) -> None:
+        """
+        Unknown content types are decoded with the default codec, as all
+        bodies were before codecs existed.
+        """
+        self.__default = default
+        self.__codecs: dict[str, Codec] = {default.content_type: default}
+        self.__unsupported: set[str] = set()
+        for codec in codecs:
+            if codec is not None:
+                self.register(codec)
+
+    def register(self, codec: Codec) -> None:
+        self.__codecs[codec.content_type] = codec
+
+    def get(self, content_type: str | None) -> Codec:
+        if not content_type:
+            return self.__default
+
+        codec = self.__codecs.get(content_type)
+        if codec is not None:
+            return codec
+
+        media_type = content_type.split(';')[0].strip().lower()
+        codec = self.__codecs.get(media_type)
+        if codec is not None:
+            return codec
+
+        if media_type not in self.__unsupported:
+            self.__unsupported.add(media_type)
+            loguru.logger.warning(
+                f'Unsupported content type {content_type}, using '
+                f'{self.__default.content_type}'
+            )
+
+        return self.__default
+
+    def loads(self, message: Any) -> Any:
+        return self.get(message.content_type).loads(message.body)
+
+    def decode(self, message: Any, schema: type[_M]) -> _M:
+        return schema.parse_obj(self.loads(message))
+
+    def dumps(self, obj: Any, content_type: str | None = None) -> bytes:
+        return self.get(content_type).dumps(obj)
+
+
+codecs = Codecs(json_codec, msgpack_codec)
@@ -1,22 +1,98 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import ClassVar, Literal
+from typing import Any, Callable, ClassVar, Literal
 
 from aio_pika import IncomingMessage
 from jose import jwt
-from jose.exceptions import JWTClaimsError, JWTError
-from jwt import ExpiredSignatureError
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
 from passlib.context import CryptContext
 
 from api import UserModel
 from api.schemas.token import Token
 from api.schemas.user import AuthorizedUser
+from common.constants.permissions import permission_matrix
 from common.constants.token_types import TokenTypes
 from common.exceptions import CoreException
+from common.tracing import tracer
 from settings import settings
 
 exception = CoreException('Could not validate credentials')
 
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _verify_password(
+    plain_password: str | bytes, hashed_password: str | bytes
+) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+class VerifiedTokenCache:
+    __slots__ = ('__max_size', '__entries', '__lock', 'hits', 'misses')
+
+    def __init__(self, max_size: int) -> None:
+        self.__max_size = max_size
+        self.__entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def get_key(token: str, access_token: str | None = None) -> bytes:
+        token_hash = hashlib.sha256(token.encode('utf-8'))
+        if access_token is not None:
+            token_hash.update(b'.' + access_token.encode('utf-8'))
+
+        return token_hash.digest()
+
+    def get(self, key: bytes) -> dict | None:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                expires, payload = entry
+                if expires > time.time():
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+
+                del self.__entries[key]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: bytes, payload: dict) -> None:
+        expires = payload.get('exp')
+        if expires is None or self.__max_size <= 0:
+            return
+
+        with self.__lock:
+            self.__entries[key] = (expires, payload)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    @property
+    def statistics(self) -> dict[str, int]:
+        return {
+            'size': len(self.__entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
 
 class JWTManager:
     @dataclass
@@ -36,21 +112,77 @@ class JWTManager:
                     self.is_valid = True
 
     def __init__(self) -> None:
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.pwd_context = pwd_context
+        self.token_cache = VerifiedTokenCache(settings.jwt_cache_size)
+        self.__hashing_pool: ProcessPoolExecutor | None = None
+        self.__hashing_in_progress: int = 0
+
+    @property
+    def hashing_pool(self) -> ProcessPoolExecutor:
+        if self.__hashing_pool is None:
+            self.__hashing_pool = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers
+            )
+
+        return self.__hashing_pool
+
+    def shutdown(self) -> None:
+        if self.__hashing_pool is not None:
+            self.__hashing_pool.shutdown(wait=False, cancel_futures=True)
+            self.__hashing_pool = None
 
     def verify_password(
         self, plain_password: str | bytes, hashed_password: str | bytes
     ) -> bool:
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return _verify_password(plain_password, hashed_password)
 
     def get_password_hash(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+        return _get_password_hash(password)
 
-    def create_token(self, user_model: UserModel) -> Token:
-        access_token = self.__create_token(user_model, TokenTypes.ACCESS)
-        refresh_token = self.__create_token(
-            user_model, TokenTypes.REFRESH, access_token=access_token
-        )
+    async def verify_password_async(
+        self, plain_password: str | bytes, hashed_password: str | bytes
+    ) -> bool:
+        with tracer.span('verify_password'):
+            return await self.__run_in_hashing_pool(
+                _verify_password, plain_password, hashed_password
+            )
+
+    async def get_password_hash_async(self, password: str) -> str:
+        with tracer.span('hash_password'):
+            return await self.__run_in_hashing_pool(
+                _get_password_hash, password
+            )
+
+    async def __run_in_hashing_pool(
+        self, function: Callable, *args: Any
+    ) -> Any:
+        if self.__hashing_in_progress >= settings.password_hash_queue_limit:
+            raise CoreException(
+                'Too many password checks in progress, try again later!'
+            )
+
+        self.__hashing_in_progress += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.hashing_pool, function, *args
+            )
+        finally:
+            self.__hashing_in_progress -= 1
+
+    def create_token(
+        self, user_model: UserModel, permission_type: str | None = None
+    ) -> Token:
+        with tracer.span('create_token'):
+            access_token = self.__create_token(
+                user_model, TokenTypes.ACCESS, permission_type=permission_type
+            )
+            refresh_token = self.__create_token(
+                user_model,
+                TokenTypes.REFRESH,
+                access_token=access_token,
+                permission_type=permission_type
+            )
 
         token = Token(
             access_token=access_token, refresh_token=refresh_token
@@ -65,11 +197,45 @@ class JWTManager:
 
         return jwt_data
 
+    @staticmethod
+    def __get_permission_claim(
+        user_model: UserModel, permission_type: str | None
+    ) -> dict | None:
+        if permission_matrix.get_permission(permission_type) is None:
+            return None
+
+        return {
+            'type': permission_type,
+            'mask': permission_matrix.type_mask(permission_type),
+            'version': permission_matrix.version,
+            'revision': user_model.permission_revision
+        }
+
+    @staticmethod
+    def is_action_valid(
+        payload: dict, action: str, permission_revision: int | None
+    ) -> bool | None:
+        """
+        Answers from the token's permission claim while it was issued for
+        the current permission matrix and the user's current permission
+        revision, None when the permissions have to be read again.
+        """
+        permission_claim = payload.get('permission')
+        if (
+            permission_claim is None
+            or permission_claim.get('version') != permission_matrix.version
+            or permission_claim.get('revision') != permission_revision
+        ):
+            return None
+
+        return permission_matrix.can_mask(permission_claim['mask'], action)
+
     def __create_token(
         self,
         user_model: UserModel,
         token_type: Literal['Access', 'Refresh'], *,
-        access_token: str | None = None
+        access_token: str | None = None,
+        permission_type: str | None = None
     ) -> str:
         if token_type == TokenTypes.ACCESS:
             expire = (
@@ -85,6 +251,12 @@ class JWTManager:
         jwt_data = self.__get_jwt_data(user_model)
         jwt_data.update({"exp": expire})
 
+        permission_claim = self.__get_permission_claim(
+            user_model, permission_type
+        )
+        if permission_claim is not None:
+            jwt_data.update({"permission": permission_claim})
+
         token = jwt.encode(
             jwt_data,
             settings.jwt_secret_key,
@@ -101,11 +273,11 @@ class JWTManager:
         if not header.is_valid:
             raise exception
 
-        datetime_now = datetime.now(timezone.utc)
+        timestamp_now = datetime.now(timezone.utc).timestamp()
         access_token = self.encode_token(message)
-        if access_token['exp'] < datetime_now:
+        if access_token['exp'] < timestamp_now:
             refresh_token = self.encode_token(message, TokenTypes.REFRESH)
-            if refresh_token['exp'] < datetime_now:
+            if refresh_token['exp'] < timestamp_now:
                 raise Exception('Re-authorization required!')
             raise Exception('Access token needs to be updated')
 
@@ -128,6 +300,14 @@ class JWTManager:
         else:
             raise exception
 
+        if token is None:
+            raise exception
+
+        cache_key = self.token_cache.get_key(token, access_token)
+        payload = self.token_cache.get(cache_key)
+        if payload is not None:
+            return payload
+
         try:
             payload = jwt.decode(
                 token,
@@ -140,19 +320,23 @@ class JWTManager:
                 'Incorrect access/refresh tokens. Need to reauthenticate!'
             )
 
+        self.token_cache.set(cache_key, payload)
+
         return payload
 
-    def refresh_token(self, message: IncomingMessage) -> Token:
+    async def get_token_user(self, message: IncomingMessage) -> UserModel:
         access_token = self.encode_token(message)
-        user_model = UserModel.get(
+        user_model = await UserModel.get_by_id_async(
+            access_token['id'],
             name=access_token['name'],
             surname=access_token['surname'],
             phone=access_token['phone'],
             password=access_token['password']
         )
-        token = self.create_token(user_model)
+        if user_model is None:
+            raise CoreException('Re-authorization required!')
 
-        return token
+        return user_model
 
 
 jwt_manager = JWTManager()
@@ -0,0 +1,97 @@
+from bisect import bisect_left
+
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'bucket_counts', 'count', 'sum')
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.bucket_counts: list[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class RPCMetrics:
+    __slots__ = ('__buckets', '__histograms')
+
+    OUTCOMES: tuple[str, str] = ('error', 'success')
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        Per-method latency histograms, preallocated for every outcome,
+        so that observing a call only bumps existing counters.
+        """
+        self.__buckets = buckets
+        self.__histograms: dict[str, tuple[Histogram, Histogram]] = {}
+
+    def register(self, method_name: str) -> None:
+        if method_name not in self.__histograms:
+            self.__histograms[method_name] = (
+                Histogram(self.__buckets), Histogram(self.__buckets)
+            )
+
+    def observe(self, method_name: str, status: bool, seconds: float) -> None:
+        histograms = self.__histograms.get(method_name)
+        if histograms is not None:
+            histograms[status].observe(seconds)
+
+    def get_histogram(self, method_name: str, status: bool) -> Histogram:
+        return self.__histograms[method_name][status]
+
+    def render(self) -> str:
+        lines = [
+            '# HELP rpc_requests_total RPC calls handled, by method and '
+            'outcome.',
+            '# TYPE rpc_requests_total counter',
+        ]
+        for method_name, histograms in self.__histograms.items():
+            for outcome, histogram in zip(self.OUTCOMES, histograms):
+                lines.append(
+                    f'rpc_requests_total{{method="{method_name}",'
+                    f'outcome="{outcome}"}} {histogram.count}'
+                )
+
+        lines.extend((
+            '# HELP rpc_request_duration_seconds RPC handler latency, by '
+            'method and outcome.',
+            '# TYPE rpc_request_duration_seconds histogram',
+        ))
+        for method_name, histograms in self.__histograms.items():
+            for outcome, histogram in zip(self.OUTCOMES, histograms):
+                labels = f'method="{method_name}",outcome="{outcome}"'
+                cumulative_count = 0
+                for bucket, bucket_count in zip(
+                    histogram.buckets, histogram.bucket_counts
+                ):
+                    cumulative_count += bucket_count
+                    lines.append(
+                        f'rpc_request_duration_seconds_bucket{{{labels},'
+                        f'le="{bucket}"}} {cumulative_count}'
+                    )
+                lines.append(
+                    f'rpc_request_duration_seconds_bucket{{{labels},'
+                    f'le="+Inf"}} {histogram.count}'
+                )
+                lines.append(
+                    f'rpc_request_duration_seconds_sum{{{labels}}} '
+                    f'{histogram.sum}'
+                )
+                lines.append(
+                    f'rpc_request_duration_seconds_count{{{labels}}} '
+                    f'{histogram.count}'
+                )
+
+        return '\n'.join(lines) + '\n'
+
+
+rpc_metrics = RPCMetrics()
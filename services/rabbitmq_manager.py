@@ -1,15 +1,28 @@
 import asyncio
-import json
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
 from dataclasses import dataclass
 from functools import partial
-from typing import Callable, Any
+from itertools import groupby
+from typing import AsyncIterator, Awaitable, Callable, Any
 
 import loguru
 from aio_pika import connect_robust, IncomingMessage, Message, DeliveryMode
+from aio_pika.abc import (
+    AbstractChannel, AbstractQueue, AbstractRobustConnection
+)
 from aio_pika.patterns import RPC
-from aiormq.tools import awaitable
+from aio_pika.pool import Pool
 from fastapi import Request, Response
 
+from common.base_manager import AsyncBaseManager
+from common.exceptions import CodecException, CoreException
+from common.tracing import tracer
+from services import sql
+from services.codec import codecs
+from services.metrics import rpc_metrics
 from settings import settings
 
 
@@ -17,6 +30,102 @@ from settings import settings
 class RabbitMQMethod:
     method_name: str
     method_function: Callable
+    prefetch_count: int | None = None
+    max_concurrency: int | None = None
+    # Kept out of a batch's shared session, for handlers that would
+    # otherwise hold its connection while awaiting password hashing.
+    own_transaction: bool = False
+
+
+@dataclass(slots=True)
+class RabbitMQBatchItem:
+    body: bytes
+    headers: dict
+    content_type: str | None = None
+    reply_to: str | None = None
+
+
+class RPCChannelPool:
+    __slots__ = (
+        '__connection_string',
+        '__max_size',
+        '__connection',
+        '__connection_lock',
+        '__pool',
+        '__created',
+        '__in_use',
+        '__acquired',
+        '__waited'
+    )
+
+    def __init__(self, connection_string: str, max_size: int) -> None:
+        """
+        Shared connection with a bounded pool of RPC channels.
+        """
+        self.__connection_string = connection_string
+        self.__max_size = max_size
+        self.__connection: AbstractRobustConnection | None = None
+        self.__connection_lock = asyncio.Lock()
+        self.__pool: Pool[RPC] | None = None
+
+        self.__created: int = 0
+        self.__in_use: int = 0
+        self.__acquired: int = 0
+        self.__waited: int = 0
+
+    async def __get_connection(self) -> AbstractRobustConnection:
+        async with self.__connection_lock:
+            if self.__connection is None or self.__connection.is_closed:
+                self.__connection = await connect_robust(
+                    self.__connection_string
+                )
+
+        return self.__connection
+
+    async def __create_rpc(self) -> RPC:
+        connection = await self.__get_connection()
+        channel = await connection.channel()
+        rpc = await RPC.create(channel)
+        self.__created += 1
+
+        return rpc
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[RPC]:
+        if self.__pool is None:
+            self.__pool = Pool(self.__create_rpc, max_size=self.__max_size)
+
+        self.__acquired += 1
+        if self.__in_use >= self.__max_size:
+            self.__waited += 1
+
+        async with self.__pool.acquire() as rpc:
+            self.__in_use += 1
+            try:
+                yield rpc
+            finally:
+                self.__in_use -= 1
+
+    async def close(self) -> None:
+        if self.__pool is not None:
+            await self.__pool.close()
+            self.__pool = None
+
+        if self.__connection is not None:
+            await self.__connection.close()
+            self.__connection = None
+
+        self.__created = 0
+
+    @property
+    def statistics(self) -> dict[str, int]:
+        return {
+            'max_size': self.__max_size,
+            'created': self.__created,
+            'in_use': self.__in_use,
+            'acquired': self.__acquired,
+            'waited': self.__waited
+        }
 
 
 class RabbitMQ:
@@ -24,6 +133,13 @@ class RabbitMQ:
         '__connection_string',
         '__loop',
         '__rpc',
+        '__rpc_pool',
+        '__in_flight',
+        '__limits',
+        '__own_transaction_methods',
+        '__consumers',
+        '__executor',
+        '__exempt_paths',
         '__service_name'
     )
 
@@ -35,16 +151,47 @@ class RabbitMQ:
         self.__service_name: str = service_name
         self.__loop: asyncio.AbstractEventLoop | None = None
         self.__rpc: RPC | None = None
+        self.__rpc_pool = RPCChannelPool(
+            connection_string, settings.rpc_channel_pool_size
+        )
+        self.__in_flight = asyncio.Semaphore(settings.rpc_max_in_flight)
+        self.__limits: dict[str, asyncio.Semaphore] = {}
+        self.__own_transaction_methods: set[str] = set()
+        self.__consumers: list[tuple[AbstractQueue, str, Callable]] = []
+        self.__executor: ThreadPoolExecutor | None = None
+        self.__exempt_paths: set[str] = set()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(
+                max_workers=settings.rpc_sync_handler_workers,
+                thread_name_prefix='rpc_handler'
+            )
+
+        return self.__executor
+
+    @property
+    def pool_statistics(self) -> dict[str, int]:
+        return self.__rpc_pool.statistics
 
     async def connect(
         self,
         loop: asyncio.AbstractEventLoop,
-        methods: list[RabbitMQMethod]
+        methods: list[RabbitMQMethod],
+        connection_factory: Callable[
+            ..., Awaitable[AbstractRobustConnection]
+        ] = connect_robust,
+        consume: bool = True
     ) -> None:
+        """
+        With consume=False the queues are declared but no messages are
+        taken until start_consuming() is called.
+        """
         self.__loop = loop
 
-        connection = await connect_robust(
-            settings.ampq_connection_string, loop=loop
+        connection = await connection_factory(
+            self.__connection_string, loop=loop
         )
 
         channel = await connection.channel()
@@ -52,25 +199,43 @@ class RabbitMQ:
         self.__rpc = rpc
 
         for method in methods:
+            method_channel = await connection.channel()
+            await method_channel.set_qos(
+                prefetch_count=(
+                    method.prefetch_count or settings.rpc_max_in_flight
+                )
+            )
             await self.__register(
-                rpc,
-                method.method_name,
-                method.method_function,
-                auto_delete=True
+                rpc, method_channel, method, auto_delete=True
+            )
+
+        if consume:
+            await self.start_consuming()
+
+    async def start_consuming(self) -> None:
+        while self.__consumers:
+            queue, method_name, func = self.__consumers.pop(0)
+            self.__rpc.consumer_tags[func] = await queue.consume(
+                partial(self.__on_call_message, method_name),
             )
 
     async def __register(
-        self, rpc: RPC, method_name: str, func: Callable, **kwargs: Any
+        self,
+        rpc: RPC,
+        channel: AbstractChannel,
+        method: RabbitMQMethod,
+        **kwargs: Any
     ) -> Any:
-        method_name = 'core_' + method_name
+        method_name = 'core_' + method.method_name
+        func = method.method_function
         arguments = kwargs.pop("arguments", {})
         arguments.update({"x-dead-letter-exchange": 'core'})
 
         kwargs["arguments"] = arguments
 
-        queue = await rpc.channel.declare_queue(method_name, **kwargs)
+        queue = await channel.declare_queue(method_name, **kwargs)
 
-        if func in rpc.consumer_tags:
+        if func in rpc.queues:
             raise RuntimeError("Function already registered")
 
         if method_name in rpc.routes:
@@ -78,13 +243,43 @@ class RabbitMQ:
                 "Method name already used for %r" % rpc.routes[method_name],
             )
 
-        rpc.consumer_tags[func] = await queue.consume(
-            partial(self.__on_call_message, method_name),
-        )
+        self.__consumers.append((queue, method_name, func))
 
-        rpc.routes[method_name] = awaitable(func)
+        rpc_metrics.register(method_name)
+        if asyncio.iscoroutinefunction(func):
+            rpc.routes[method_name] = func
+        else:
+            rpc.routes[method_name] = partial(self.__run_in_executor, func)
         rpc.queues[func] = queue
 
+        if method.max_concurrency is not None:
+            self.__limits[method_name] = asyncio.Semaphore(
+                method.max_concurrency
+            )
+        if method.own_transaction:
+            self.__own_transaction_methods.add(method_name)
+
+    async def __run_in_executor(
+        self, func: Callable, message: IncomingMessage
+    ) -> Any:
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, context.run, func, message
+        )
+
+    async def __call_method(
+        self, method_name: str, method: Callable, message: IncomingMessage
+    ) -> Any:
+        # A method's own limit is awaited first, so that a request queued
+        # behind it does not hold one of the service-wide slots.
+        limit = self.__limits.get(method_name)
+        if limit is None:
+            async with self.__in_flight:
+                return await method(message)
+
+        async with limit, self.__in_flight:
+            return await method(message)
+
     async def __on_call_message(
         self, method_name: str, message: IncomingMessage,
     ) -> None:
@@ -92,36 +287,162 @@ class RabbitMQ:
         if method is None:
             return
 
+        async with message.process(requeue=False, ignore_processed=True):
+            if message.headers.get('batch'):
+                result_message = await self.__get_batch_result(
+                    method_name, message
+                )
+            else:
+                result_message = await self.__get_result(
+                    method_name, method, message
+                )
+
+            if message.reply_to is not None:
+                await self.__reply(message, result_message)
+
+    async def __reply(
+        self, message: IncomingMessage, result_message: dict
+    ) -> None:
+        codec = codecs.get(message.content_type)
         try:
-            result = await method(message)
-            result_message = {'status': True, 'answer': result}
-        except Exception as exception:
-            result_message = {'status': False, 'error': str(exception)}
+            body = codec.dumps(result_message)
+        except CodecException as exception:
+            body = codec.dumps({'status': False, 'error': str(exception)})
 
-        if message.reply_to is not None:
-            result_message = json.dumps(result_message).encode('utf-8')
-            new_message = Message(
-                result_message, delivery_mode=DeliveryMode.NOT_PERSISTENT
-            )
-            await self.__rpc.channel.default_exchange.publish(
-                new_message, message.reply_to
-            )
+        new_message = Message(
+            body,
+            content_type=codec.content_type,
+            correlation_id=message.correlation_id,
+            delivery_mode=DeliveryMode.NOT_PERSISTENT
+        )
+        await self.__rpc.channel.default_exchange.publish(
+            new_message, message.reply_to
+        )
+
+    async def __get_result(
+        self,
+        method_name: str,
+        method: Callable,
+        message: IncomingMessage | RabbitMQBatchItem
+    ) -> dict:
+        started_at = time.perf_counter()
+        with tracer.start_trace(method_name, message.headers) as span:
+            try:
+                result = await self.__call_method(
+                    method_name, method, message
+                )
+                result_message = {'status': True, 'answer': result}
+            except (Exception, CoreException) as exception:
+                result_message = {'status': False, 'error': str(exception)}
+                if span is not None:
+                    span.error = result_message['error']
+
+        rpc_metrics.observe(
+            method_name,
+            result_message['status'],
+            time.perf_counter() - started_at
+        )
+
+        return result_message
+
+    async def __get_batch_result(
+        self, method_name: str, message: IncomingMessage
+    ) -> dict:
+        try:
+            batch = codecs.loads(message)
+            if not isinstance(batch, list):
+                raise CoreException('Batch must be a list of requests!')
+            if len(batch) > settings.rpc_max_batch_size:
+                raise CoreException(
+                    f'Batch is limited to {settings.rpc_max_batch_size} '
+                    f'requests!'
+                )
+
+            # Consecutive items share one session, their handlers' own
+            # managers become savepoints in it, so a failing item only
+            # loses its own writes. Items of own_transaction methods run
+            # between those sessions.
+            results = []
+            for own_transaction, batch_items in groupby(
+                batch,
+                key=lambda batch_item: self.__get_batch_item_method_name(
+                    method_name, batch_item
+                ) in self.__own_transaction_methods
+            ):
+                async with (
+                    nullcontext() if own_transaction
+                    else AsyncBaseManager(sql)
+                ):
+                    results.extend([
+                        await self.__get_batch_item_result(
+                            method_name, message, batch_item
+                        )
+                        for batch_item in batch_items
+                    ])
+        except (Exception, CoreException) as exception:
+            return {'status': False, 'error': str(exception)}
+
+        return {'status': True, 'answer': results}
+
+    @staticmethod
+    def __get_batch_item_method_name(method_name: str, batch_item: Any) -> str:
+        if isinstance(batch_item, dict) and 'method' in batch_item:
+            return 'core_' + str(batch_item['method'])
+
+        return method_name
+
+    async def __get_batch_item_result(
+        self, method_name: str, message: IncomingMessage, batch_item: Any
+    ) -> dict:
+        if not isinstance(batch_item, dict):
+            return {'status': False, 'error': 'Incorrect batch request!'}
+
+        method_name = self.__get_batch_item_method_name(
+            method_name, batch_item
+        )
+        method = self.__rpc.routes.get(method_name)
+        if method is None:
+            return {'status': False, 'error': f'Unknown method {method_name}'}
+
+        item_message = RabbitMQBatchItem(
+            body=codecs.dumps(
+                batch_item.get('payload', {}), message.content_type
+            ),
+            headers=message.headers,
+            content_type=message.content_type
+        )
+
+        return await self.__get_result(method_name, method, item_message)
+
+    def exempt_paths(self, *paths: str) -> None:
+        """
+        HTTP routes served without an RPC channel, so that they keep
+        answering while the broker is unavailable.
+        """
+        self.__exempt_paths.update(paths)
 
     async def rpc_middleware(
         self, request: Request, call_next: Callable
     ) -> Any:
+        if request.url.path in self.__exempt_paths:
+            return await call_next(request)
+
         try:
-            connection = await connect_robust(
-                settings.ampq_connection_string, loop=self.__loop
-            )
-            channel = await connection.channel()
-            request.state.rpc = await RPC.create(channel)
-            response = await call_next(request)
+            async with self.__rpc_pool.acquire() as rpc:
+                request.state.rpc = rpc
+                response = await call_next(request)
         except Exception as exception:
             response = Response("Internal server error", status_code=500)
             loguru.logger.exception(str(exception))
 
         return response
 
+    async def close(self) -> None:
+        await self.__rpc_pool.close()
+
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
 
 rabbit_mq = RabbitMQ(settings.ampq_connection_string, settings.service_name)
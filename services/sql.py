@@ -1,9 +1,17 @@
+import re
+import threading
 import time
+from contextvars import ContextVar, Token
+from typing import Any
 
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+import loguru
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine, make_url
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine, AsyncSession, create_async_engine
+)
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
 from common.constants.sql import SQLConstant
 from settings import settings
@@ -13,12 +21,176 @@ class SessionAreNotAvailable(Exception):
     ...
 
 
+class QueryCounter:
+    __slots__ = ('queries', 'selects')
+
+    def __init__(self) -> None:
+        self.queries: int = 0
+        self.selects: dict[str, int] = {}
+
+
+class StatementStatistics:
+    __slots__ = ('count', 'total_time', 'max_time')
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.total_time: float = 0.0
+        self.max_time: float = 0.0
+
+
+class SQLMonitor:
+    __slots__ = ('__counter', '__statements')
+
+    MAX_STATEMENTS: int = 1024
+
+    _number_regex = re.compile(r'\d+')
+
+    def __init__(self) -> None:
+        """
+        Times every statement, logs slow ones and counts the statements
+        issued inside one BaseManager transaction.
+        """
+        self.__counter: ContextVar[QueryCounter | None] = ContextVar(
+            'query_counter', default=None
+        )
+        self.__statements: dict[str, StatementStatistics] = {}
+
+    @property
+    def statements(self) -> dict[str, StatementStatistics]:
+        return self.__statements
+
+    @property
+    def current_counter(self) -> QueryCounter | None:
+        return self.__counter.get()
+
+    def instrument(self, engine: Engine) -> None:
+        event.listen(
+            engine, 'before_cursor_execute', self._before_cursor_execute
+        )
+        event.listen(
+            engine, 'after_cursor_execute', self._after_cursor_execute
+        )
+
+    def start_counting(self) -> Token[QueryCounter | None]:
+        return self.__counter.set(QueryCounter())
+
+    def stop_counting(
+        self, token: Token[QueryCounter | None]
+    ) -> QueryCounter | None:
+        counter = self.__counter.get()
+        self.__counter.reset(token)
+        if counter is None:
+            return None
+
+        for statement, count in counter.selects.items():
+            if count >= settings.sql_repeated_query_threshold:
+                loguru.logger.warning(
+                    f'Possible N+1: a similar SELECT ran {count} times in '
+                    f'one transaction ({counter.queries} queries in total): '
+                    f'{statement}'
+                )
+
+        return counter
+
+    @staticmethod
+    def redact_parameters(parameters: Any) -> Any:
+        if isinstance(parameters, dict):
+            return {key: '?' for key in parameters}
+        if isinstance(parameters, (list, tuple)):
+            if parameters and isinstance(parameters[0], (dict, list, tuple)):
+                return f'<{len(parameters)} parameter sets>'
+            return ['?'] * len(parameters)
+
+        return '?'
+
+    @staticmethod
+    def _before_cursor_execute(
+        connection: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool
+    ) -> None:
+        connection.info.setdefault('query_started_at', []).append(
+            time.perf_counter()
+        )
+
+    def _after_cursor_execute(
+        self,
+        connection: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool
+    ) -> None:
+        elapsed = time.perf_counter() - connection.info[
+            'query_started_at'
+        ].pop()
+
+        statistics = self.__statements.get(statement)
+        if statistics is None and len(self.__statements) < self.MAX_STATEMENTS:
+            statistics = self.__statements[statement] = StatementStatistics()
+        if statistics is not None:
+            statistics.count += 1
+            statistics.total_time += elapsed
+            if elapsed > statistics.max_time:
+                statistics.max_time = elapsed
+
+        if elapsed >= settings.sql_slow_query_threshold:
+            loguru.logger.warning(
+                f'Slow SQL query ({elapsed * 1000:.1f} ms): {statement} '
+                f'| parameters: {self.redact_parameters(parameters)}'
+            )
+
+        counter = self.__counter.get()
+        if counter is not None:
+            counter.queries += 1
+            if statement.lstrip()[:6].upper() == 'SELECT':
+                select_key = self._number_regex.sub('N', statement)
+                counter.selects[select_key] = (
+                    counter.selects.get(select_key, 0) + 1
+                )
+
+
+def _set_read_only(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute('SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY')
+    cursor.close()
+    dbapi_connection.commit()
+
+
 class SQL:
-    __slots__ = ('__client', '__session')
+    __slots__ = (
+        '__client',
+        '__session',
+        '__session_scope',
+        '__async_client',
+        '__async_session_factory',
+        '__async_session',
+        '__monitor',
+        '__is_read_only'
+    )
 
     def __init__(self):
         self.__client: Engine | None = None
-        self.__session: Session | None = None
+        self.__session: scoped_session | None = None
+        self.__session_scope: ContextVar[object | None] = ContextVar(
+            'session_scope', default=None
+        )
+
+        self.__async_client: AsyncEngine | None = None
+        self.__async_session_factory: sessionmaker | None = None
+        self.__async_session: ContextVar[AsyncSession | None] = ContextVar(
+            'async_session', default=None
+        )
+        self.__monitor = SQLMonitor()
+        self.__is_read_only: bool = False
+
+    @property
+    def monitor(self) -> SQLMonitor:
+        return self.__monitor
 
     @property
     def client(self) -> Engine:
@@ -32,7 +204,89 @@ class SQL:
         if self.__session is None:
             self._create_session()
 
-        return self.__session
+        return self.__session()
+
+    def open_session_scope(self) -> Token[object | None]:
+        return self.__session_scope.set(object())
+
+    def close_session_scope(self, token: Token[object | None]) -> None:
+        try:
+            if self.__session is not None:
+                self.__session.remove()
+        finally:
+            self.__session_scope.reset(token)
+
+    def _get_session_scope(self) -> object:
+        scope = self.__session_scope.get()
+        if scope is None:
+            return threading.get_ident()
+
+        return scope
+
+    @property
+    def async_client(self) -> AsyncEngine:
+        if self.__async_client is None:
+            self._create_async_engine()
+
+        return self.__async_client
+
+    @property
+    def async_session(self) -> AsyncSession:
+        session = self.__async_session.get()
+        if session is None:
+            raise SessionAreNotAvailable(
+                'Async SQL session is only available inside '
+                'an AsyncBaseManager transaction.'
+            )
+
+        return session
+
+    @property
+    def current_async_session(self) -> AsyncSession | None:
+        return self.__async_session.get()
+
+    def create_async_session(self) -> AsyncSession:
+        if self.__async_session_factory is None:
+            self.__async_session_factory = sessionmaker(
+                self.async_client,
+                class_=AsyncSession,
+                expire_on_commit=False
+            )
+
+        return self.__async_session_factory()
+
+    def bind_async_session(
+        self, session: AsyncSession
+    ) -> Token[AsyncSession | None]:
+        return self.__async_session.set(session)
+
+    def unbind_async_session(self, token: Token[AsyncSession | None]) -> None:
+        self.__async_session.reset(token)
+
+    @property
+    def is_read_only(self) -> bool:
+        return self.__is_read_only
+
+    def enable_read_only(self) -> None:
+        """
+        Makes every new connection read-only, pooled sync connections are
+        dropped so that they reconnect with the setting applied.
+        """
+        if self.__is_read_only:
+            return
+
+        self.__is_read_only = True
+        if self.__client is not None:
+            event.listen(self.__client, 'connect', _set_read_only)
+            self.__client.dispose()
+        if self.__async_client is not None:
+            event.listen(
+                self.__async_client.sync_engine, 'connect', _set_read_only
+            )
+
+    async def close(self) -> None:
+        if self.__async_client is not None:
+            await self.__async_client.dispose()
 
     def _create_engine(self) -> None:
         self.__client = create_engine(
@@ -40,6 +294,25 @@ class SQL:
             echo=False,
             pool_pre_ping=True
         )
+        self.__monitor.instrument(self.__client)
+        if self.__is_read_only:
+            event.listen(self.__client, 'connect', _set_read_only)
+
+    def _create_async_engine(self) -> None:
+        connection_url = make_url(settings.sql_connection_string).set(
+            drivername=settings.sql_async_driver
+        )
+        self.__async_client = create_async_engine(
+            connection_url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_size=settings.sql_async_pool_size
+        )
+        self.__monitor.instrument(self.__async_client.sync_engine)
+        if self.__is_read_only:
+            event.listen(
+                self.__async_client.sync_engine, 'connect', _set_read_only
+            )
 
     def _create_session(self) -> None:
         try_restarts_after_fail = 0
@@ -47,7 +320,10 @@ class SQL:
         def _attempt_create_session(tries: int):
             for _ in range(SQLConstant.MAX_CONNECT_TRIES):
                 try:
-                    self.__session = Session(self.client)
+                    self.__session = scoped_session(
+                        sessionmaker(self.client),
+                        scopefunc=self._get_session_scope
+                    )
                     return
                 except SQLAlchemyError:
                     time.sleep(SQLConstant.SECONDS_SLEEP_AFTER_TRY)
@@ -1,3 +1,4 @@
+import asyncio
 import re
 import socket
 from datetime import timedelta
@@ -20,33 +21,50 @@ class Settings(pydantic.BaseSettings):
     jwt_algorithm: str
     jwt_access_token_expires = timedelta(minutes=15)
     jwt_refresh_token_expires = timedelta(days=30)
+    jwt_cache_size: int = 4096
+
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 64
 
     local_files_root: str
     docker_files_root: str
 
     run_alembic: bool
     sql_connection_string: str
-
-    @pydantic.validator('sql_connection_string')
-    def resolve_host(cls, v: str):
-        host_regex = (
-            r'(?:\@)((\w+)|(((25[0-5]|(2[0-4]|1\d|[1-9]|)\d)\.?\b)+))(?:\:)'
-        )
-        word_regex = r'\w+'
-
-        host = re.search(host_regex, v).group(1)
-
-        if re.match(word_regex, host):
-            host = socket.gethostbyname(host)
-
-        connection_string = re.sub(host_regex, '@{0}:'.format(host), v)
-        return connection_string
+    sql_async_driver: str = 'postgresql+asyncpg'
+    sql_async_pool_size: int = 10
+    sql_slow_query_threshold: float = 0.2
+    sql_repeated_query_threshold: int = 5
+    sql_warm_up_connections: int = 2
+    reference_cache_ttl: float = 300.0
+    identity_cache_size: int = 4096
+    identity_cache_ttl: float = 60.0
 
     ampq_connection_string: str
+    # Upper bound of RPC handlers running at once across all methods.
+    # Every handler gets its own SQL session, so this is also the number
+    # of transactions that may run concurrently; keep it at or below
+    # sql_async_pool_size plus its overflow. Each method channel also
+    # prefetches this many messages, the surplus waits un-acked.
+    rpc_max_in_flight: int = 10
+    rpc_channel_pool_size: int = 8
+    rpc_sync_handler_workers: int = 8
+    rpc_max_batch_size: int = 100
+
+    tracing_exporter: str = ''
+    tracing_sample_ratio: float = 0.01
+    tracing_file_path: str = 'traces.jsonl'
+    tracing_otlp_endpoint: str = 'http://localhost:4318'
 
     alembic_debug: bool = True
     auto_apply_migrations: bool = True
     is_first_start: bool = False
+    # Replicas that find another one migrating poll the schema version
+    # until it is done; past the timeout they either fail or, with the
+    # fallback on, start with read-only database sessions.
+    migration_lock_timeout: float = 300.0
+    migration_poll_interval: float = 2.0
+    migration_read_only_fallback: bool = False
 
     local_files_root: str
     docker_files_root: str
@@ -58,6 +76,31 @@ class Settings(pydantic.BaseSettings):
         else:
             return self.docker_files_root
 
+    async def resolve_sql_host(self) -> None:
+        """
+        Replaces the database host name with its address; runs during
+        startup, before the first engine is created.
+        """
+        host_regex = (
+            r'(?:\@)((\w+)|(((25[0-5]|(2[0-4]|1\d|[1-9]|)\d)\.?\b)+))(?:\:)'
+        )
+        word_regex = r'\w+'
+
+        host_match = re.search(host_regex, self.sql_connection_string)
+        if host_match is None:
+            return
+
+        host = host_match.group(1)
+        if re.match(word_regex, host):
+            addresses = await asyncio.get_running_loop().getaddrinfo(
+                host, None, family=socket.AF_INET, type=socket.SOCK_STREAM
+            )
+            host = addresses[0][4][0]
+
+        self.sql_connection_string = re.sub(
+            host_regex, '@{0}:'.format(host), self.sql_connection_string
+        )
+
     class Config:
         env_file = '.env'
         env_file_encoding = 'utf-8'
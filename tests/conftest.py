@@ -1,4 +1,7 @@
 import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 
 from api.schemas.user import UserCreate
 from services import sql
@@ -17,6 +20,37 @@ def session_transaction() -> None:
     connection.close()
 
 
+@pytest.fixture
+def sqlite_models() -> tuple[type, ...]:
+    return ()
+
+
+@pytest.fixture
+def sqlite_rows() -> tuple:
+    return ()
+
+
+@pytest.fixture
+def sqlite_engine(
+    sqlite_models: tuple[type, ...], sqlite_rows: tuple
+) -> Engine:
+    """
+    In-memory SQLite with the tables of sqlite_models, seeded with the
+    instances in sqlite_rows; modules override both fixtures or
+    parametrize them.
+    """
+    engine = create_engine('sqlite://')
+    for model in sqlite_models:
+        model.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all(sqlite_rows)
+        session.commit()
+
+    yield engine
+
+    engine.dispose()
+
+
 @pytest.fixture
 def cities_collection() -> list[str]:
     return ['New York', 'Moscow', 'Rostov-on-Don']
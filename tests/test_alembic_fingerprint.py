@@ -0,0 +1,52 @@
+import json
+
+from sqlalchemy import BigInteger, Column, Index, MetaData, String, Table
+
+from common.base_model import BaseModelInterface
+from services.alembic.alembic_handler import (
+    FINGERPRINT_TABLE_NAME, include_name, metadata_fingerprint,
+    sort_metadata_tables
+)
+
+
+def create_metadata(phone_length: int = 32) -> MetaData:
+    metadata = MetaData()
+    Table(
+        'user_model',
+        metadata,
+        Column('id', BigInteger, primary_key=True),
+        Column('phone', String(phone_length)),
+        Index('ix_user_model_phone', 'phone')
+    )
+    Table(
+        'legacy_model',
+        metadata,
+        Column('id', BigInteger, primary_key=True),
+        comment=json.dumps({'delete_table': True})
+    )
+
+    return metadata
+
+
+def test_fingerprint_is_stable_and_tracks_schema_changes():
+    assert metadata_fingerprint(create_metadata()) == metadata_fingerprint(
+        create_metadata()
+    )
+    assert metadata_fingerprint(create_metadata()) != metadata_fingerprint(
+        create_metadata(phone_length=64)
+    )
+    assert len(metadata_fingerprint(BaseModelInterface.metadata)) == 64
+
+
+def test_sort_metadata_tables_drops_deleted_tables():
+    metadata = create_metadata()
+
+    for _ in range(2):
+        sorted_tables = sort_metadata_tables(metadata.tables)
+        assert list(sorted_tables) == ['user_model']
+        assert sorted_tables['user_model'].comment == 'null'
+
+
+def test_fingerprint_table_is_hidden_from_autogenerate():
+    assert not include_name(FINGERPRINT_TABLE_NAME, 'table', {})
+    assert include_name('user_model', 'table', {})
@@ -0,0 +1,33 @@
+from benchmarks.suite import (
+    SkipBenchmark, benchmark, benchmarks, find_regressions, load_baselines,
+    run_benchmarks, save_baselines
+)
+
+
+def test_find_regressions_respects_tolerance():
+    baselines = {'fast': 1.0, 'slow': 1.0}
+    results = {'fast': 1.1, 'slow': 1.5, 'new': 9.0}
+
+    assert find_regressions(results, baselines, 0.25) == {'slow': 1.5}
+
+
+def test_save_baselines_merges_existing(tmp_path):
+    path = str(tmp_path / 'baselines.json')
+    save_baselines(path, {'a': 1.0, 'b': 2.0})
+    save_baselines(path, {'b': 3.0})
+
+    assert load_baselines(path) == {'a': 1.0, 'b': 3.0}
+
+
+def test_skipped_benchmarks_are_reported():
+    @benchmark('test.skipped', number=1, repeat=1)
+    def skipped():
+        raise SkipBenchmark('no database\ndetails')
+
+    try:
+        results, skipped_benchmarks = run_benchmarks('test.skipped')
+    finally:
+        del benchmarks['test.skipped']
+
+    assert results == {}
+    assert skipped_benchmarks == {'test.skipped': 'no database'}
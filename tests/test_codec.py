@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+from api.schemas.token import Token
+from api.schemas.user import UserAuthorization
+from common.exceptions import CodecException
+from services.codec import codecs, msgpack_codec
+
+
+def test_json_codec_serializes_pydantic_models():
+    token = Token(access_token='access', refresh_token='refresh')
+    body = codecs.dumps({'status': True, 'answer': token})
+
+    assert codecs.get(None).loads(body) == {
+        'status': True,
+        'answer': {
+            'access_token': 'access',
+            'refresh_token': 'refresh',
+            'token_type': 'Bearer'
+        }
+    }
+
+
+def test_decode_message_from_bytes():
+    message = SimpleNamespace(
+        body=b'{"password": "123", "phone": "456"}', content_type=None
+    )
+    user = codecs.decode(message, UserAuthorization)
+
+    assert user == UserAuthorization(password='123', phone='456')
+
+
+@pytest.mark.skipif(msgpack_codec is None, reason='msgpack is not installed')
+def test_msgpack_codec_roundtrip():
+    content_type = msgpack_codec.content_type
+    message = SimpleNamespace(
+        body=codecs.dumps({'password': '123'}, content_type),
+        content_type=content_type
+    )
+
+    assert codecs.decode(message, UserAuthorization).password == '123'
+
+
+def test_content_type_parameters_and_unknown_types():
+    assert codecs.get('Application/JSON; charset=utf-8') is codecs.get(None)
+    assert codecs.get('text/plain') is codecs.get(None)
+
+
+def test_codec_errors():
+    with pytest.raises(CodecException):
+        codecs.get(None).loads(b'{')
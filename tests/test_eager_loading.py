@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from api.models import (
+    CityModel, PermissionTypeModel, PermissionUserModel, UserModel
+)
+from api.models.permission_user_model import (
+    load_permission_type, load_user_permissions
+)
+from services.sql import SQLMonitor
+
+
+@pytest.fixture
+def sqlite_models() -> tuple[type, ...]:
+    return CityModel, UserModel, PermissionTypeModel, PermissionUserModel
+
+
+@pytest.fixture
+def sqlite_rows() -> tuple:
+    return (
+        UserModel(id=1, name='A', surname='B', phone='1', password='x'),
+        PermissionTypeModel(id=1, permission_type='Admin'),
+        PermissionTypeModel(id=2, permission_type='User'),
+        PermissionUserModel(
+            id=1, user_id=1, permission_type_id=1, available=False
+        ),
+        PermissionUserModel(
+            id=2, user_id=1, permission_type_id=2, available=True
+        ),
+    )
+
+
+@pytest.fixture
+def monitor(sqlite_engine) -> SQLMonitor:
+    monitor = SQLMonitor()
+    monitor.instrument(sqlite_engine)
+
+    return monitor
+
+
+def count_queries(monitor: SQLMonitor, engine, load) -> tuple[int, list]:
+    token = monitor.start_counting()
+    with Session(engine) as session:
+        permission_types = load(session)
+    counter = monitor.stop_counting(token)
+
+    return counter.queries, permission_types
+
+
+def test_user_permissions_are_loaded_in_one_statement(sqlite_engine, monitor):
+    def load(session: Session) -> list[str]:
+        result = session.execute(
+            UserModel.select_statement((load_user_permissions(),), phone='1'),
+            {'phone': '1'}
+        )
+        user_model = result.unique().scalars().one()
+
+        return sorted(
+            user_permission.permission_type.permission_type
+            for user_permission in user_model.permissions
+        )
+
+    assert count_queries(monitor, sqlite_engine, load) == (
+        1, ['Admin', 'User']
+    )
+
+
+def test_lazy_loading_needs_a_statement_per_relationship(
+    sqlite_engine, monitor
+):
+    def load(session: Session) -> list[str]:
+        result = session.execute(
+            UserModel.select_statement(phone='1'), {'phone': '1'}
+        )
+        user_model = result.scalars().one()
+
+        return sorted(
+            user_permission.permission_type.permission_type
+            for user_permission in user_model.permissions
+        )
+
+    assert count_queries(monitor, sqlite_engine, load) == (
+        4, ['Admin', 'User']
+    )
+
+
+def test_permission_link_is_loaded_with_its_type(sqlite_engine, monitor):
+    def load(session: Session) -> list[str]:
+        result = session.execute(
+            PermissionUserModel.select_statement(
+                (load_permission_type(),), user_id=1, available=True
+            ),
+            {'user_id': 1, 'available': True}
+        )
+        user_permission = result.unique().scalars().one()
+
+        return [user_permission.permission_type.permission_type]
+
+    assert count_queries(monitor, sqlite_engine, load) == (1, ['User'])
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+from sqlalchemy.orm import Session
+
+from api.models import CityModel, UserModel
+from common.reference_cache import IdentityCache
+
+
+@pytest.fixture
+def sqlite_models() -> tuple[type, ...]:
+    return CityModel, UserModel
+
+
+@pytest.fixture
+def sqlite_rows() -> tuple:
+    return UserModel(id=1, name='A', surname='B', phone='1', password='x'),
+
+
+def test_lookups_are_cached_after_commit_as_read_only_snapshots(sqlite_engine):
+    identity_cache = IdentityCache(UserModel, max_size=8, ttl=60)
+
+    with Session(sqlite_engine) as session:
+        identity_cache.add_after_commit(session, session.get(UserModel, 1))
+        assert identity_cache.get(1) is None
+        session.commit()
+
+    row = identity_cache.get(1)
+    assert row['name'] == 'A'
+    with pytest.raises(TypeError):
+        row['name'] = 'C'
+
+
+def test_updates_evict_and_are_not_cached_from_the_same_transaction(
+    sqlite_engine
+):
+    identity_cache = IdentityCache(UserModel, max_size=8, ttl=60)
+    identity_cache.add({'id': 1, 'name': 'A'})
+
+    with Session(sqlite_engine) as session:
+        user_model = session.get(UserModel, 1)
+        identity_cache.add_after_commit(session, user_model)
+        user_model.phone = '2'
+        session.flush()
+        assert identity_cache.get(1) is None
+        session.commit()
+
+    assert identity_cache.get(1) is None
+
+
+def test_size_and_ttl_are_bounded():
+    identity_cache = IdentityCache(UserModel, max_size=2, ttl=60)
+    for user_id in range(3):
+        identity_cache.add({'id': user_id})
+
+    assert len(identity_cache) == 2
+    assert identity_cache.get(0) is None
+
+    expiring_cache = IdentityCache(UserModel, max_size=2, ttl=0.01)
+    expiring_cache.add({'id': 1})
+    time.sleep(0.02)
+    assert expiring_cache.get(1) is None
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import delete, update
+
+from api.behavior.user_manager import UserManager
+from api.methods.users import refresh_access_token
+from api.models import PermissionTypeModel, PermissionUserModel, UserModel
+from api.schemas.user import AuthorizedUser, UserCreate
+from common.constants.permissions import PermissionActions, PermissionTypes
+from services import sql
+from services.jwt_manager import VerifiedTokenCache, jwt_manager
+
+
+def test_verified_token_cache_hits_and_misses():
+    cache = VerifiedTokenCache(max_size=2)
+    key = cache.get_key('token')
+    payload = {'id': 1, 'exp': time.time() + 60}
+
+    assert cache.get(key) is None
+    cache.set(key, payload)
+    assert cache.get(key) is payload
+
+    assert cache.statistics == {'size': 1, 'hits': 1, 'misses': 1}
+
+
+def test_verified_token_cache_expires_at_exp():
+    cache = VerifiedTokenCache(max_size=2)
+    key = cache.get_key('token')
+    cache.set(key, {'id': 1, 'exp': time.time() - 1})
+
+    assert cache.get(key) is None
+    assert cache.statistics['size'] == 0
+
+
+def test_verified_token_cache_is_bounded():
+    cache = VerifiedTokenCache(max_size=2)
+    keys = [cache.get_key(f'token_{index}') for index in range(3)]
+    for key in keys:
+        cache.set(key, {'exp': time.time() + 60})
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None
+    assert cache.get(keys[2]) is not None
+
+
+def test_verified_token_cache_key_depends_on_access_token():
+    assert (
+        VerifiedTokenCache.get_key('refresh', 'access')
+        != VerifiedTokenCache.get_key('refresh')
+    )
+
+
+def create_token_message(
+    user_model: UserModel, permission_type: str
+) -> SimpleNamespace:
+    token = jwt_manager.create_token(user_model, permission_type)
+    return SimpleNamespace(headers={
+        'Authorization': f'{token.token_type} {token.access_token}',
+        'refresh': token.refresh_token
+    })
+
+
+def test_permission_claim_is_trusted_for_the_current_revision():
+    user_model = UserModel(
+        id=1, name='A', surname='B', phone='1', city_id=1, password='x',
+        available=True, permission_revision=3
+    )
+    payload = jwt_manager.encode_token(
+        create_token_message(user_model, PermissionTypes.CLIENT)
+    )
+
+    assert jwt_manager.is_action_valid(
+        payload, PermissionActions.CREATE_TRANSFER, 3
+    ) is True
+    assert jwt_manager.is_action_valid(
+        payload, PermissionActions.ASSIGN_ADMINISTRATOR, 3
+    ) is False
+    assert jwt_manager.is_action_valid(
+        payload, PermissionActions.CREATE_TRANSFER, 4
+    ) is None
+
+    outdated_payload = dict(
+        payload, permission=dict(payload['permission'], version='outdated')
+    )
+    assert jwt_manager.is_action_valid(
+        outdated_payload, PermissionActions.CREATE_TRANSFER, 3
+    ) is None
+
+
+async def register_and_promote() -> tuple[dict, dict, int]:
+    user = UserCreate(
+        name='Refresh', surname='Path', phone='refresh-path', city='C',
+        password='x', permission=PermissionTypes.CLIENT
+    )
+    async with UserManager(sql) as transaction:
+        user_model = await transaction.user_registration_handler(user, 'x')
+    message = create_token_message(user_model, PermissionTypes.CLIENT)
+
+    try:
+        async with UserManager(sql) as transaction:
+            await transaction.session.execute(
+                update(PermissionUserModel)
+                .where(PermissionUserModel.user_id == user_model.id)
+                .values(available=False)
+            )
+            permission_type = await PermissionTypeModel.get_or_create_async(
+                permission_type=PermissionTypes.ADMINISTRATOR
+            )
+            await PermissionUserModel.get_or_create_async(
+                user_id=user_model.id, permission_type_id=permission_type.id
+            )
+
+        payload = jwt_manager.encode_token(message)
+        async with UserManager(sql) as transaction:
+            can_assign = await transaction.is_action_valid(
+                AuthorizedUser.parse_obj(payload),
+                PermissionActions.ASSIGN_ADMINISTRATOR,
+                payload
+            )
+
+        token = await refresh_access_token(message)
+        refreshed_payload = jwt_manager.encode_token(SimpleNamespace(
+            headers={'Authorization': f'Bearer {token.access_token}'}
+        ))
+    finally:
+        async with UserManager(sql) as transaction:
+            await transaction.session.execute(
+                delete(UserModel).where(UserModel.id == user_model.id)
+            )
+        await sql.close()
+
+    return payload, refreshed_payload, can_assign
+
+
+def test_changed_permissions_are_read_again_and_refreshed():
+    payload, refreshed_payload, can_assign = asyncio.run(
+        register_and_promote()
+    )
+
+    assert payload['permission']['type'] == PermissionTypes.CLIENT
+    assert can_assign is True
+    assert refreshed_payload['permission']['type'] == (
+        PermissionTypes.ADMINISTRATOR
+    )
+    assert refreshed_payload['permission']['revision'] > (
+        payload['permission']['revision']
+    )
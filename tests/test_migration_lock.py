@@ -0,0 +1,130 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from common.base_model import BaseModelInterface
+from common.exceptions import MigrationException
+from services.alembic.alembic_handler import (
+    AlembicHandler, metadata_fingerprint
+)
+from settings import settings
+
+
+class WaitingAlembicHandler(AlembicHandler):
+    def __init__(self, current_after: int | None) -> None:
+        super().__init__(
+            None, create_engine('sqlite://'), BaseModelInterface.metadata
+        )
+        self.current_after = current_after
+        self.polls = 0
+
+    @contextmanager
+    def _migration_lock(self):
+        yield False
+
+    def _migrate(self, fingerprint: str):
+        raise AssertionError('Only the lock holder migrates')
+
+    def _is_fingerprint_stored(self, fingerprint: str) -> bool:
+        self.polls += 1
+        return self.current_after is not None and (
+            self.polls >= self.current_after
+        )
+
+
+@pytest.fixture
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(settings, 'migration_lock_timeout', 0.05)
+    monkeypatch.setattr(settings, 'migration_poll_interval', 0.01)
+
+
+def test_waits_until_another_instance_has_migrated(fast_polling):
+    alembic_handler = WaitingAlembicHandler(current_after=3)
+
+    sorted_tables = alembic_handler.execute()
+
+    assert alembic_handler.polls == 3
+    assert not alembic_handler.is_read_only
+    assert set(sorted_tables) <= set(BaseModelInterface.metadata.tables)
+
+
+def test_times_out_or_falls_back_to_read_only(fast_polling, monkeypatch):
+    with pytest.raises(MigrationException):
+        WaitingAlembicHandler(current_after=None).execute()
+
+    monkeypatch.setattr(settings, 'migration_read_only_fallback', True)
+    alembic_handler = WaitingAlembicHandler(current_after=None)
+    alembic_handler.execute()
+
+    assert alembic_handler.is_read_only
+
+
+def test_does_not_wait_when_migrations_are_not_applied(
+    fast_polling, monkeypatch
+):
+    monkeypatch.setattr(settings, 'auto_apply_migrations', False)
+    alembic_handler = WaitingAlembicHandler(current_after=None)
+    alembic_handler.execute()
+
+    # The check before taking the lock and the one after missing it.
+    assert alembic_handler.polls == 2
+    assert not alembic_handler.is_read_only
+
+
+def create_handler(version_num: str | None = None) -> AlembicHandler:
+    alembic_handler = AlembicHandler(
+        None, create_engine('sqlite://'), BaseModelInterface.metadata
+    )
+    if version_num is not None:
+        with alembic_handler._sql_client.begin() as connection:
+            connection.execute(text(
+                'CREATE TABLE alembic_version (version_num VARCHAR(32))'
+            ))
+            connection.execute(
+                text('INSERT INTO alembic_version VALUES (:version_num)'),
+                {'version_num': version_num}
+            )
+
+    return alembic_handler
+
+
+def test_waiters_ignore_local_script_heads():
+    fingerprint = metadata_fingerprint(BaseModelInterface.metadata)
+    assert not create_handler()._is_fingerprint_stored(fingerprint)
+
+    alembic_handler = create_handler('generated_elsewhere')
+    alembic_handler._store_fingerprint(fingerprint)
+
+    assert alembic_handler._is_fingerprint_stored(fingerprint)
+    assert not alembic_handler._is_fingerprint_current(fingerprint)
+
+
+def test_shipped_revisions_are_detected():
+    script_head, = create_handler()._get_script_heads()
+
+    assert create_handler('5b1f3c9d2a7e')._is_database_behind()
+    assert not create_handler(script_head)._is_database_behind()
+    assert not create_handler('generated_elsewhere')._is_database_behind()
+    assert not create_handler()._is_database_behind()
+
+
+def test_stored_fingerprint_skips_the_lock_unless_the_database_is_behind(
+    monkeypatch
+):
+    fingerprint = metadata_fingerprint(BaseModelInterface.metadata)
+    script_head, = create_handler()._get_script_heads()
+    migrated = []
+    for version_num in (script_head, '5b1f3c9d2a7e'):
+        alembic_handler = create_handler(version_num)
+        alembic_handler._store_fingerprint(fingerprint)
+        monkeypatch.setattr(
+            alembic_handler,
+            '_migrate',
+            lambda fingerprint, version_num=version_num: migrated.append(
+                version_num
+            )
+        )
+        alembic_handler.execute()
+
+    assert migrated == ['5b1f3c9d2a7e']
@@ -0,0 +1,59 @@
+import pytest
+
+from common.constants.permissions import (
+    PermissionActions, Permissions, PermissionTypes
+)
+from common.exceptions import CoreException
+
+
+def test_permission_values_are_cached():
+    assert PermissionTypes.values() is PermissionTypes.values()
+    assert PermissionTypes.values() == (
+        PermissionTypes.CLIENT,
+        PermissionTypes.MODERATOR,
+        PermissionTypes.ADMINISTRATOR
+    )
+
+
+def test_get_permission():
+    for permission in Permissions.values():
+        assert Permissions.get_permission(
+            permission.permission_type
+        ) is permission
+
+    assert Permissions.get_permission('unknown') is None
+
+
+def test_can_matches_permission_actions():
+    for permission in Permissions.values():
+        for action in PermissionActions.values():
+            assert Permissions.can(permission.permission_type, action) is (
+                action in permission.permission_actions
+            )
+
+    assert not Permissions.can('unknown', PermissionActions.VIEW_PROFILE)
+    assert not Permissions.can(PermissionTypes.CLIENT, 'unknown')
+
+
+def test_can_all():
+    client_mask = Permissions.actions_mask(
+        PermissionActions.CREATE_TRANSFER, PermissionActions.VIEW_PROFILE
+    )
+    administrator_mask = Permissions.actions_mask(
+        PermissionActions.VIEW_ALL_PROFILES,
+        PermissionActions.ASSIGN_ADMINISTRATOR
+    )
+
+    assert Permissions.can_all(PermissionTypes.CLIENT, client_mask)
+    assert not Permissions.can_all(PermissionTypes.MODERATOR, client_mask)
+    assert Permissions.can_all(
+        PermissionTypes.ADMINISTRATOR, administrator_mask
+    )
+    assert not Permissions.can_all(
+        PermissionTypes.MODERATOR, administrator_mask
+    )
+
+
+def test_unknown_action_mask():
+    with pytest.raises(CoreException):
+        Permissions.actions_mask('unknown')
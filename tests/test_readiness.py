@@ -0,0 +1,28 @@
+import asyncio
+import json
+
+from api.routers import readiness as readiness_router
+from common.readiness import Readiness
+
+
+def test_ready_only_when_every_phase_is_done():
+    startup_readiness = Readiness()
+    assert not startup_readiness.is_ready
+
+    startup_readiness.register('broker', 'schema')
+    startup_readiness.mark_ready('broker')
+    assert not startup_readiness.is_ready
+
+    startup_readiness.mark_ready('schema')
+    assert startup_readiness.is_ready
+
+
+def test_ready_route_reports_pending_phases(monkeypatch):
+    readiness = Readiness()
+    readiness.register('test_phase')
+    monkeypatch.setattr(readiness_router, 'readiness', readiness)
+
+    response = asyncio.run(readiness_router.ready())
+
+    assert response.status_code == 503
+    assert json.loads(response.body)['phases']['test_phase'] is False
@@ -0,0 +1,157 @@
+import asyncio
+import gc
+import weakref
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from api.models import CityModel
+from common.base_manager import AsyncBaseManager
+from common.reference_cache import ReferenceCache
+from services import sql
+
+
+@pytest.fixture
+def sqlite_models() -> tuple[type, ...]:
+    return CityModel,
+
+
+@pytest.fixture
+def sqlite_rows() -> tuple:
+    return (
+        CityModel(id=1, city='Moscow'), CityModel(id=2, city='Rostov-on-Don')
+    )
+
+
+def load(reference_cache: ReferenceCache, engine) -> None:
+    with engine.connect() as connection:
+        reference_cache.load(
+            connection.execute(select(CityModel.__table__)).mappings()
+        )
+
+
+def test_cached_rows_are_merged_without_queries(sqlite_engine):
+    reference_cache = ReferenceCache(CityModel, 'city')
+    load(reference_cache, sqlite_engine)
+    statements = []
+    event.listen(
+        sqlite_engine,
+        'before_cursor_execute',
+        lambda *args: statements.append(args[2])
+    )
+
+    with Session(sqlite_engine) as session:
+        city = session.merge(
+            reference_cache.to_instance(reference_cache.get('Moscow')),
+            load=False
+        )
+
+        assert (city.id, city.city) == (1, 'Moscow')
+        assert reference_cache.get('New York') is None
+        assert statements == []
+
+
+def test_rows_are_added_only_after_commit(sqlite_engine):
+    reference_cache = ReferenceCache(CityModel, 'city')
+    load(reference_cache, sqlite_engine)
+
+    with Session(sqlite_engine) as session:
+        session.execute(
+            CityModel.__table__.insert().values(id=3, city='Kazan')
+        )
+        reference_cache.add_after_commit(
+            session, CityModel(id=3, city='Kazan')
+        )
+        session.rollback()
+    assert reference_cache.get('Kazan') is None
+
+    with Session(sqlite_engine) as session:
+        reference_cache.add_after_commit(session, session.get(CityModel, 2))
+        session.commit()
+    assert reference_cache.get('Rostov-on-Don') == {
+        'id': 2, 'city': 'Rostov-on-Don'
+    }
+
+
+def test_orm_writes_invalidate_the_cache(sqlite_engine):
+    reference_cache = ReferenceCache(CityModel, 'city')
+    load(reference_cache, sqlite_engine)
+    assert reference_cache.is_loaded
+
+    with Session(sqlite_engine) as session:
+        session.get(CityModel, 1).city = 'Moskva'
+        session.commit()
+
+    assert not reference_cache.is_loaded
+
+
+def test_discarded_caches_are_freed(sqlite_engine):
+    reference_cache = ReferenceCache(CityModel, 'city')
+    reference = weakref.ref(reference_cache)
+    del reference_cache
+    gc.collect()
+
+    assert reference() is None
+
+    reference_cache = ReferenceCache(CityModel, 'city')
+    load(reference_cache, sqlite_engine)
+    with Session(sqlite_engine) as session:
+        session.get(CityModel, 1).city = 'Moskva'
+        session.commit()
+
+    assert not reference_cache.is_loaded
+
+
+def test_snapshots_loaded_in_a_rolled_back_session_are_dropped(sqlite_engine):
+    reference_cache = ReferenceCache(CityModel, 'city')
+
+    for end_transaction, is_loaded in (
+        (Session.rollback, False), (Session.commit, True)
+    ):
+        with Session(sqlite_engine) as session:
+            session.execute(
+                CityModel.__table__.insert().values(id=3, city='Kazan')
+            )
+            reference_cache.load(
+                session.execute(select(CityModel.__table__)).mappings(),
+                session
+            )
+            assert reference_cache.get('Kazan') is not None
+            end_transaction(session)
+
+        assert reference_cache.is_loaded is is_loaded
+
+
+async def look_up_concurrently(city: str, lookups: int) -> list[str]:
+    async with AsyncBaseManager(sql):
+        await CityModel.get_or_create_async(city=city)
+    CityModel.invalidate_reference_cache()
+
+    async def look_up() -> CityModel:
+        async with AsyncBaseManager(sql):
+            return await CityModel.get_async(city=city)
+
+    statements = []
+    sync_engine = sql.async_client.sync_engine
+
+    def on_execute(*args) -> None:
+        statements.append(args[2])
+
+    event.listen(sync_engine, 'before_cursor_execute', on_execute)
+    try:
+        await asyncio.gather(*(look_up() for _ in range(lookups)))
+    finally:
+        event.remove(sync_engine, 'before_cursor_execute', on_execute)
+        await sql.close()
+
+    return statements
+
+
+def test_concurrent_misses_load_the_table_once():
+    statements = asyncio.run(look_up_concurrently('Moscow', 8))
+
+    assert len([
+        statement for statement in statements
+        if 'FROM city_model' in statement
+    ]) == 1
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+from aio_pika import Message
+
+from benchmarks.memory_broker import MemoryBroker
+from services import sql
+from services.rabbitmq_manager import RabbitMQ, RabbitMQMethod
+from settings import settings
+
+
+async def echo(message) -> dict:
+    return json.loads(message.body)
+
+
+async def call(connection, method_name: str, body, headers=None) -> dict:
+    channel = await connection.channel()
+    reply_queue = await channel.declare_queue(None, exclusive=True)
+    reply = asyncio.get_running_loop().create_future()
+
+    async def on_reply(message) -> None:
+        reply.set_result((message.correlation_id, json.loads(message.body)))
+
+    await reply_queue.consume(on_reply, no_ack=True)
+    await channel.default_exchange.publish(
+        Message(
+            json.dumps(body).encode('utf-8'),
+            headers=headers or {},
+            correlation_id='request-1',
+            reply_to=reply_queue.name
+        ),
+        'core_' + method_name
+    )
+
+    return await asyncio.wait_for(reply, timeout=5)
+
+
+async def serve_and_call(method_name: str, body, headers=None):
+    broker = MemoryBroker()
+    server = RabbitMQ('amqp://memory', 'test')
+    await server.connect(
+        asyncio.get_running_loop(),
+        [RabbitMQMethod('echo', echo)],
+        connection_factory=broker.connect
+    )
+    connection = await broker.connect()
+    try:
+        return await call(connection, method_name, body, headers)
+    finally:
+        await server.close()
+        await connection.close()
+
+
+def test_reply_carries_correlation_id():
+    correlation_id, reply = asyncio.run(serve_and_call('echo', {'a': 1}))
+
+    assert correlation_id == 'request-1'
+    assert reply == {'status': True, 'answer': {'a': 1}}
+
+
+def test_batch_envelope_through_memory_broker():
+    batch = [{'payload': {'index': 0}}, {'method': 'missing'}]
+    _, reply = asyncio.run(serve_and_call('echo', batch, {'batch': True}))
+
+    assert reply['status'] is True
+    assert reply['answer'][0] == {'status': True, 'answer': {'index': 0}}
+    assert reply['answer'][1]['status'] is False
+
+
+async def serve_concurrent_calls(method_names: list[str]) -> int:
+    running = []
+    max_running = 0
+
+    def create_method(method_name: str) -> RabbitMQMethod:
+        async def slow(message) -> None:
+            nonlocal max_running
+            running.append(message)
+            max_running = max(max_running, len(running))
+            await asyncio.sleep(0.05)
+            running.remove(message)
+
+        return RabbitMQMethod(method_name, slow)
+
+    broker = MemoryBroker()
+    server = RabbitMQ('amqp://memory', 'test')
+    await server.connect(
+        asyncio.get_running_loop(),
+        [create_method(method_name) for method_name in method_names],
+        connection_factory=broker.connect
+    )
+    connection = await broker.connect()
+    try:
+        await asyncio.gather(*(
+            call(connection, method_name, {}) for method_name in method_names
+        ))
+    finally:
+        await server.close()
+        await connection.close()
+
+    return max_running
+
+
+def test_handlers_in_flight_are_capped_across_methods(monkeypatch):
+    monkeypatch.setattr(settings, 'rpc_max_in_flight', 1)
+
+    assert asyncio.run(serve_concurrent_calls(['first', 'second'])) == 1
+
+
+async def in_session(message) -> bool:
+    return sql.current_async_session is not None
+
+
+async def in_own_transaction(message) -> bool:
+    return sql.current_async_session is not None
+
+
+async def serve_batch_with_own_transaction(batch: list[dict]) -> dict:
+    broker = MemoryBroker()
+    server = RabbitMQ('amqp://memory', 'test')
+    await server.connect(
+        asyncio.get_running_loop(),
+        [
+            RabbitMQMethod('shared', in_session),
+            RabbitMQMethod('own', in_own_transaction, own_transaction=True)
+        ],
+        connection_factory=broker.connect
+    )
+    connection = await broker.connect()
+    try:
+        _, reply = await call(connection, 'shared', batch, {'batch': True})
+    finally:
+        await server.close()
+        await connection.close()
+        await sql.close()
+
+    return reply
+
+
+def test_batch_items_share_a_session_unless_they_own_a_transaction():
+    batch = [{}, {'method': 'own'}, {'method': 'shared'}]
+    reply = asyncio.run(serve_batch_with_own_transaction(batch))
+
+    assert [item['answer'] for item in reply['answer']] == [True, False, True]
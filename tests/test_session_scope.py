@@ -0,0 +1,28 @@
+import threading
+
+from services import sql
+
+
+def test_session_scope_isolation():
+    default_session = sql.session
+
+    token = sql.open_session_scope()
+    scoped_session = sql.session
+    assert scoped_session is sql.session
+    assert scoped_session is not default_session
+    sql.close_session_scope(token)
+
+    assert sql.session is default_session
+
+
+def test_session_scope_per_thread():
+    sessions = []
+
+    def resolve_session():
+        sessions.append(sql.session)
+
+    thread = threading.Thread(target=resolve_session)
+    thread.start()
+    thread.join()
+
+    assert sessions[0] is not sql.session
@@ -41,3 +41,14 @@ def test_user_model(
         assert user_model.phone == user.phone
         assert city_model.city == user.city
         assert user_model.password == user.password
+
+
+def test_get_or_create_returns_existing_rows(session: sqlalchemy.orm.Session):
+    permission_type_model = PermissionTypeModel.get_or_create(
+        permission_type='Existing'
+    )
+    session.flush()
+
+    assert PermissionTypeModel.get_or_create(
+        permission_type='Existing'
+    ) is permission_type_model
@@ -0,0 +1,66 @@
+import loguru
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from services.sql import SQLMonitor
+from settings import settings
+
+
+@pytest.fixture
+def monitored_engine() -> tuple[SQLMonitor, Engine]:
+    engine = create_engine('sqlite://')
+    monitor = SQLMonitor()
+    monitor.instrument(engine)
+
+    return monitor, engine
+
+
+@pytest.fixture
+def log_messages() -> list[str]:
+    messages = []
+    handler_id = loguru.logger.add(messages.append, format='{message}')
+
+    yield messages
+
+    loguru.logger.remove(handler_id)
+
+
+def test_repeated_selects_are_reported(
+    monitored_engine: tuple[SQLMonitor, Engine], log_messages: list[str]
+):
+    monitor, engine = monitored_engine
+
+    token = monitor.start_counting()
+    with engine.connect() as connection:
+        for user_id in range(settings.sql_repeated_query_threshold):
+            connection.execute(text('SELECT :user_id'), {'user_id': user_id})
+    counter = monitor.stop_counting(token)
+
+    assert counter.queries == settings.sql_repeated_query_threshold
+    assert monitor.current_counter is None
+    assert any('Possible N+1' in message for message in log_messages)
+
+
+def test_slow_queries_are_logged_redacted(
+    monitored_engine: tuple[SQLMonitor, Engine],
+    log_messages: list[str],
+    monkeypatch: pytest.MonkeyPatch
+):
+    monitor, engine = monitored_engine
+    monkeypatch.setattr(settings, 'sql_slow_query_threshold', 0.0)
+
+    with engine.connect() as connection:
+        connection.execute(text('SELECT :password'), {'password': 'secret'})
+
+    assert monitor.statements['SELECT ?'].count == 1
+    assert any('Slow SQL query' in message for message in log_messages)
+    assert not any('secret' in message for message in log_messages)
+
+
+def test_redact_parameters():
+    assert SQLMonitor.redact_parameters({'a': 1}) == {'a': '?'}
+    assert SQLMonitor.redact_parameters((1, 2)) == ['?', '?']
+    assert SQLMonitor.redact_parameters([{'a': 1}, {'a': 2}]) == (
+        '<2 parameter sets>'
+    )
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from api.models import CityModel, PermissionUserModel
+from common.base_model import StatementCache, statement_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_statement_cache():
+    statement_cache.clear()
+
+    yield
+
+    statement_cache.clear()
+
+
+@pytest.fixture
+def sqlite_models() -> tuple[type, ...]:
+    return CityModel,
+
+
+@pytest.fixture
+def sqlite_rows() -> tuple:
+    return (
+        CityModel(id=1, city='Moscow'),
+        CityModel(id=2, city='Rostov-on-Don'),
+        CityModel(id=3, city=None),
+    )
+
+
+@pytest.fixture
+def session(sqlite_engine):
+    with Session(sqlite_engine) as session:
+        yield session
+
+
+def get(session: Session, **kwargs) -> CityModel | None:
+    result = session.execute(CityModel.select_statement(**kwargs), kwargs)
+
+    return result.scalars().first()
+
+
+def test_statements_are_reused_for_the_same_filter_columns():
+    statement = CityModel.select_statement(id=1, city='Moscow')
+
+    assert CityModel.select_statement(city='Kazan', id=2) is statement
+    assert CityModel.select_statement(city='Kazan') is not statement
+    assert CityModel.select_statement(id=1, city=None) is not statement
+    assert PermissionUserModel.upsert_statement(
+        user_id=1, permission_type_id=2
+    ) is PermissionUserModel.upsert_statement(
+        permission_type_id=3, user_id=4
+    )
+
+
+def test_values_are_bound_on_execution(session: Session):
+    assert get(session, city='Moscow').id == 1
+    assert get(session, city='Rostov-on-Don').id == 2
+    assert get(session, id=2, city='Moscow') is None
+    assert get(session, city=None).id == 3
+
+
+def test_least_recently_used_statements_are_evicted():
+    cache = StatementCache(max_size=2)
+    first, second, third = (select(CityModel) for _ in range(3))
+    cache.add(('first',), first)
+    cache.add(('second',), second)
+    assert cache.get(('first',)) is first
+
+    cache.add(('third',), third)
+
+    assert len(cache) == 2
+    assert cache.get(('second',)) is None
+    assert cache.get(('first',)) is first
@@ -0,0 +1,67 @@
+import pytest
+
+from common.tracing import Tracer
+
+
+class ListSpanExporter:
+    def __init__(self) -> None:
+        self.spans = []
+
+    def export(self, request: dict) -> None:
+        for resource_spans in request['resourceSpans']:
+            for scope_spans in resource_spans['scopeSpans']:
+                self.spans.extend(scope_spans['spans'])
+
+
+@pytest.fixture
+def exporter() -> ListSpanExporter:
+    return ListSpanExporter()
+
+
+def test_spans_propagate_traceparent(exporter: ListSpanExporter):
+    tracer = Tracer('core', 0.0, exporter)
+    trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+    headers = {'traceparent': f'00-{trace_id}-00f067aa0ba902b7-01'}
+
+    with tracer.start_trace('core_user_authorization', headers) as root:
+        with tracer.span('verify_password') as child:
+            assert tracer.current_span is child
+    tracer.shutdown()
+
+    assert root.trace_id == child.trace_id == trace_id
+    assert root.parent_span_id == '00f067aa0ba902b7'
+    assert child.parent_span_id == root.span_id
+    assert [span['name'] for span in exporter.spans] == [
+        'verify_password', 'core_user_authorization'
+    ]
+
+
+def test_unsampled_traces_are_not_recorded(exporter: ListSpanExporter):
+    tracer = Tracer('core', 0.0, exporter)
+    headers = {
+        'traceparent': '00-4bf92f3577b34da6a3ce929d0e0e4736-'
+                       '00f067aa0ba902b7-00'
+    }
+
+    with tracer.start_trace('core_user_authorization', headers) as root:
+        with tracer.span('verify_password') as child:
+            pass
+    with tracer.start_trace('core_user_authorization') as no_header_root:
+        pass
+    tracer.shutdown()
+
+    assert root is child is no_header_root is None
+    assert exporter.spans == []
+
+
+def test_span_records_error(exporter: ListSpanExporter):
+    tracer = Tracer('core', 1.0, exporter)
+
+    with pytest.raises(ValueError):
+        with tracer.start_trace('core_user_registration'):
+            raise ValueError('boom')
+    tracer.shutdown()
+
+    assert exporter.spans[0]['status'] == {
+        'code': 2, 'message': 'ValueError: boom'
+    }
@@ -0,0 +1,24 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from api.models import CityModel, PermissionUserModel, UserModel
+
+
+def test_upsert_statement_targets_the_unique_constraint():
+    statement = str(
+        PermissionUserModel.upsert_statement(
+            user_id=1, permission_type_id=2
+        ).compile(dialect=postgresql.dialect())
+    )
+
+    assert 'ON CONFLICT (user_id, permission_type_id) DO NOTHING' in statement
+    assert 'RETURNING permission_user_model.id' in statement
+
+
+def test_upsert_needs_postgres_and_every_key():
+    assert CityModel.can_upsert(postgresql.dialect(), city='Moscow')
+    assert not CityModel.can_upsert(sqlite.dialect(), city='Moscow')
+    assert not PermissionUserModel.can_upsert(
+        postgresql.dialect(), user_id=1
+    )
+    assert not UserModel.can_upsert(postgresql.dialect(), phone='1')
+    assert not CityModel.can_upsert(postgresql.dialect(), city='M', id=1)